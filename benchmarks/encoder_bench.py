@@ -0,0 +1,62 @@
+# Compares the rich markup path of render_scene against the direct ANSI encoder.
+# Run from a novel directory: python3 -m benchmarks.encoder_bench --image images/ani.jpg
+import argparse
+import io
+import time
+from rich.console import Console
+from src.render_engine import RenderEngine, encode_ansi, encode_budgeted, encode_rich
+
+
+def timed(fn, repeat: int):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2], result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="render_scene encoder benchmark.")
+    parser.add_argument("--image", default="images/ani.jpg")
+    parser.add_argument("--width", type=int, default=250)
+    parser.add_argument("--height", type=int, default=70)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--tolerance", type=int, nargs="*", default=[8, 32])
+    args = parser.parse_args()
+
+    pixels, avg_colors, symbols = RenderEngine.prepare_scene(args.image, args.width, args.height, 3)
+    console = Console(file=io.StringIO(), color_system="truecolor", width=args.width, force_terminal=True)
+
+    def rich_path():
+        console.file = io.StringIO()
+        console.print(encode_rich(pixels, avg_colors, symbols), end="")
+        return console.file.getvalue().encode("utf-8")
+
+    def ansi_path():
+        return encode_ansi(pixels, avg_colors, symbols)
+
+    top, bottom, halves = RenderEngine.prepare_halfblock(args.image, args.width, args.height, 3)
+
+    def halfblock_path():
+        return encode_ansi(top, bottom, halves)
+
+    cells = pixels.shape[0] * pixels.shape[1]
+    print(f"frame: {pixels.shape[1]}x{pixels.shape[0]} ({cells} cells)")
+    # (name, encoder, image pixels shown per cell)
+    paths = [("rich", rich_path, 1), ("ansi", ansi_path, 1)]
+    for tolerance in args.tolerance:
+        paths.append((f"ansi~{tolerance}", lambda t=tolerance: encode_budgeted(pixels, avg_colors, symbols, t)[2], 1))
+    paths.append(("half", halfblock_path, 2))
+    for tolerance in args.tolerance:
+        paths.append((f"half~{tolerance}", lambda t=tolerance: encode_budgeted(top, bottom, halves, t)[2], 2))
+    for name, fn, density in paths:
+        median, data = timed(fn, args.repeat)
+        print(f"{name:>8}: {median * 1000:8.2f} ms/frame  {len(data):>8} bytes  {len(data) / cells:6.2f} bytes/cell"
+              f"  {len(data) / (cells * density):6.2f} bytes/pixel")
+
+
+if __name__ == "__main__":
+    main()
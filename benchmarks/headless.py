@@ -0,0 +1,151 @@
+# Synthetic novels and a terminal-free engine for the benchmarks.
+import io
+import json
+import os
+import random
+import struct
+import time
+import wave
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+from rich.console import Console  # noqa: E402
+from src.config import cv2, np  # noqa: E402
+from src.logic_engine import LogicEngine, AudioManager, NullBackend  # noqa: E402
+
+WORDS = ("the", "door", "rain", "quiet", "letter", "station", "you", "said", "never", "light", "again", "window")
+
+SCRIPT = """
+function modify_scene(scene)
+    local visits = tonumber(scene.get_choice("visits") or "0") + 1
+    scene.add_choice("visits", tostring(visits))
+    if visits % 2 == 0 then
+        scene.person = "Narrator"
+    end
+    return scene
+end
+
+function post_scene()
+    engine.add_choice("seen_{id}", "1")
+end
+"""
+
+
+def generate_novel(root: str, scenes: int = 200, text_length: int = 120, image_sizes=((640, 360),),
+                   images: int = 8, script_density: float = 0.25, music_density: float = 0.05, seed: int = 1) -> str:
+    rng = random.Random(seed)
+    for folder in ("scenes", "images", "scripts", "music"):
+        os.makedirs(os.path.join(root, folder), exist_ok=True)
+
+    backgrounds = []
+    for i in range(images):
+        width, height = image_sizes[i % len(image_sizes)]
+        y, x = np.mgrid[0:height, 0:width]
+        image = np.dstack([x * 255 // max(width - 1, 1), y * 255 // max(height - 1, 1), (x + y + i * 40) % 256])
+        image = (image + np.random.default_rng(seed + i).integers(0, 24, image.shape)).clip(0, 255).astype(np.uint8)
+        path = f"images/bg{i}.png"
+        cv2.imwrite(os.path.join(root, path), image)
+        backgrounds.append(path)
+
+    track = "music/theme.wav"
+    with wave.open(os.path.join(root, track), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(8000)
+        f.writeframes(struct.pack("<800h", *([0] * 800)))
+
+    for scene_id in range(1, scenes + 1):
+        words = []
+        while sum(len(w) + 1 for w in words) < text_length:
+            words.append(rng.choice(WORDS))
+        scene = {
+            "id": scene_id,
+            "text": " ".join(words).capitalize() + ".",
+            "person": rng.choice(("You", "Mira", "Stranger")),
+            "background": backgrounds[(scene_id // 5) % len(backgrounds)] if backgrounds else "",
+        }
+        if rng.random() < script_density:
+            scene["script"] = f"scripts/s{scene_id}.lua"
+            with open(os.path.join(root, scene["script"]), "w", encoding="utf-8") as f:
+                f.write(SCRIPT.replace("{id}", str(scene_id)))
+        if rng.random() < music_density:
+            scene["music"] = track
+        with open(os.path.join(root, "scenes", f"{scene_id}.json"), "w", encoding="utf-8") as f:
+            json.dump(scene, f)
+
+    with open(os.path.join(root, ".nvlrc"), "w", encoding="utf-8") as f:
+        f.write("nvl-name=bench\nscene-dir=scenes\nsave-file=save.json\nscene-bundle=\n")
+    return root
+
+
+class RecordingFile(io.TextIOBase):
+    # counts what the engine writes instead of drawing it
+    def __init__(self) -> None:
+        self.buffer = self
+        self.bytes = 0
+        self.writes = 0
+
+    def write(self, data) -> int:
+        self.writes += 1
+        self.bytes += len(data.encode("utf-8")) if isinstance(data, str) else len(data)
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def isatty(self) -> bool:
+        return True
+
+
+class ScriptedInput:
+    # replaces getpass: returns at once and stamps when each scene finished
+    def __init__(self) -> None:
+        self.stamps = []
+
+    def __call__(self, prompt: str = "") -> str:
+        self.stamps.append(time.perf_counter())
+        return ""
+
+
+class HeadlessEngine(LogicEngine):
+    def __init__(self, width: int = 160, height: int = 48) -> None:
+        super().__init__()
+        self.output = RecordingFile()
+        self.console = Console(file=self.output, width=width, height=height, force_terminal=True,
+                               color_system="truecolor", legacy_windows=False)
+        self.w, self.h = width, height
+        self.read_input = ScriptedInput()
+        self.audio = AudioManager(self.fs, NullBackend())
+
+    def exit(self):
+        self.prefetcher.shutdown()
+        self.saves.close()
+        self.audio.close()
+        self.tracer.close()
+
+
+class Samples:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.values = []
+
+    def time(self, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        self.values.append(time.perf_counter() - start)
+        return result
+
+    def percentile(self, q: float) -> float:
+        values = sorted(self.values)
+        return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+    def summary(self) -> dict:
+        total = sum(self.values)
+        return {
+            "count": len(self.values),
+            "p50_ms": self.percentile(50) * 1e3,
+            "p90_ms": self.percentile(90) * 1e3,
+            "p99_ms": self.percentile(99) * 1e3,
+            "max_ms": max(self.values) * 1e3,
+            "ops_per_s": len(self.values) / total if total else 0.0,
+        }
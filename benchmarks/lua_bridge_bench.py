@@ -0,0 +1,67 @@
+# Per-call overhead of apply_lua_logic: the old per-call dict bridge against the persistent scene proxy.
+# Run from a novel directory: python3 -m benchmarks.lua_bridge_bench
+import argparse
+import os
+import time
+
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+from src.logic_engine import LogicEngine, cv2  # noqa: E402
+
+SCRIPT = """
+function modify_scene(scene)
+    scene.add_choice("visits", "1")
+    if scene.get_choice("visits") == "1" then
+        scene.text = scene.text
+    end
+    return scene
+end
+"""
+
+
+def dict_bridge(engine):
+    # the bridge as it was: a fresh dict of values and bound methods on every call
+    scene_data = {
+        "id": engine.id,
+        "text": engine.text,
+        "background": engine.background,
+        "person": engine.person,
+        "get_choice": engine.get_choice,
+        "delete_choice": engine.delete_choice,
+        "add_choice": engine.add_choice,
+        "cv": cv2,
+        "music": engine.music,
+    }
+    new_scene = engine.lua_env.modify_scene(scene_data)
+    if isinstance(new_scene, dict):
+        engine.text = new_scene.get("text", engine.text)
+        engine.person = new_scene.get("person", engine.person)
+        engine.background = new_scene.get("background", engine.background)
+        engine.choices = new_scene.get("choices", engine.choices)
+        engine.show_tab = new_scene.get("show_tab", True)
+
+
+def bench(fn, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description="apply_lua_logic bridge benchmark.")
+    parser.add_argument("--calls", type=int, default=20000)
+    args = parser.parse_args()
+
+    engine = LogicEngine()
+    engine.text = "benchmark text"
+    engine.lua.execute(SCRIPT)
+
+    before = bench(lambda: dict_bridge(engine), args.calls)
+    after = bench(engine.apply_lua_logic, args.calls)
+    print(f"dict bridge:  {before * 1e6:8.2f} us/call")
+    print(f"scene proxy:  {after * 1e6:8.2f} us/call  ({before / after:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# End-to-end engine benchmark on a generated novel, no terminal, audio device or keyboard needed.
+# python3 -m benchmarks.novel_bench --scenes 500 --json after.json --compare before.json
+import argparse
+import json
+import os
+import subprocess
+import tempfile
+import time
+
+from benchmarks.headless import HeadlessEngine, Samples, generate_novel
+
+
+def stage_bench(args) -> dict:
+    stages = {name: Samples(name) for name in
+              ("register_scenes", "load_scene", "apply_lua_logic", "render_scene", "render_tab", "save_game")}
+    engine = HeadlessEngine(args.width, args.height)
+    stages["register_scenes"].time(engine.register_scenes)
+    for scene_id in engine.scenes.ids:
+        stages["load_scene"].time(engine.custom_scene, scene_id)
+        stages["apply_lua_logic"].time(engine.apply_lua_logic)
+        stages["render_scene"].time(engine.render_scene)
+        stages["render_tab"].time(engine.render_tab)
+        stages["save_game"].time(engine.save_game)
+    engine.saves.flush()
+    engine.exit()
+    result = {name: samples.summary() for name, samples in stages.items()}
+    result["bytes_written"] = engine.output.bytes
+    return result
+
+
+def run_bench(args) -> dict:
+    engine = HeadlessEngine(args.width, args.height)
+    if args.trace:
+        engine.tracer.configure(True, path=args.trace)
+    samples = Samples("run_scene")
+    start = time.perf_counter()
+    engine.run(load_save=False)
+    stamps = [start] + engine.read_input.stamps
+    samples.values = [b - a for a, b in zip(stamps, stamps[1:])]
+    result = {"run_scene": samples.summary(), "bytes_written": engine.output.bytes}
+    if args.trace:
+        print(engine.tracer.format_summary())
+    # the loop already called exit() after the last scene
+    return result
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ""
+
+
+def print_report(results: dict, baseline: dict) -> None:
+    print(f"{'stage':<18}{'count':>7}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}{'ops/s':>11}")
+    for section in ("stages", "run"):
+        for name, row in results[section].items():
+            if not isinstance(row, dict):
+                continue
+            line = (f"{name:<18}{row['count']:>7}{row['p50_ms']:>10.3f}{row['p90_ms']:>10.3f}"
+                    f"{row['p99_ms']:>10.3f}{row['max_ms']:>10.3f}{row['ops_per_s']:>11.1f}")
+            old = baseline.get(section, {}).get(name)
+            if isinstance(old, dict) and row["p50_ms"]:
+                line += f"   p50 {old['p50_ms'] / row['p50_ms']:.2f}x vs {baseline.get('revision') or 'baseline'}"
+            print(line)
+    print(f"bytes written: stages {results['stages']['bytes_written']}, run {results['run']['bytes_written']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless engine benchmark on a synthetic novel.")
+    parser.add_argument("--scenes", type=int, default=300)
+    parser.add_argument("--text-length", type=int, default=160)
+    parser.add_argument("--image-size", nargs="*", default=["640x360", "1280x720"])
+    parser.add_argument("--images", type=int, default=8)
+    parser.add_argument("--script-density", type=float, default=0.25)
+    parser.add_argument("--music-density", type=float, default=0.05)
+    parser.add_argument("--width", type=int, default=160)
+    parser.add_argument("--height", type=int, default=48)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--dir", default="", help="Generate into this directory instead of a temporary one.")
+    parser.add_argument("--json", default="", help="Write results to this file.")
+    parser.add_argument("--trace", default="", help="Trace the run loop and write Chrome trace JSON here.")
+    parser.add_argument("--compare", default="", help="Results file of an earlier run to compare against.")
+    args = parser.parse_args()
+
+    image_sizes = [tuple(int(v) for v in size.split("x")) for size in args.image_size]
+    baseline = {}
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.abspath(args.dir or tmp)
+        generate_novel(root, args.scenes, args.text_length, image_sizes, args.images,
+                       args.script_density, args.music_density, args.seed)
+        # the engine resolves everything against the novel directory
+        os.chdir(root)
+        try:
+            results = {"revision": git_revision(), "config": vars(args),
+                       "stages": stage_bench(args), "run": run_bench(args)}
+        finally:
+            os.chdir(cwd)
+
+    print_report(results, baseline)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# Memory held by parsed scenes: plain json dicts against interned SceneRecords.
+# python3 -m benchmarks.scene_memory_bench --scenes 100000
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+
+from benchmarks.headless import WORDS
+from src.capatibilities.scene_store import SceneRecord
+
+
+def scene_sources(scenes: int, text_length: int, images: int, seed: int) -> list:
+    # the same shape generate_novel writes, kept as json text so no files are needed;
+    # paths are spelled two ways like hand written scenes tend to be
+    rng = random.Random(seed)
+    sources = []
+    for scene_id in range(1, scenes + 1):
+        words = []
+        while sum(len(w) + 1 for w in words) < text_length:
+            words.append(rng.choice(WORDS))
+        background = f"images/bg{(scene_id // 5) % images}.png"
+        scene = {
+            "id": scene_id,
+            "text": " ".join(words).capitalize() + ".",
+            "person": rng.choice(("You", "Mira", "Stranger")),
+            "background": background if rng.random() < 0.5 else "./" + background,
+        }
+        if rng.random() < 0.25:
+            scene["script"] = f"scripts/s{scene_id}.lua"
+        if rng.random() < 0.05:
+            scene["music"] = "music/theme.wav"
+        sources.append(json.dumps(scene))
+    return sources
+
+
+def measure(sources: list, build) -> dict:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    scenes = [build(json.loads(source)) for source in sources]
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "mb": current / 2 ** 20,
+        "peak_mb": peak / 2 ** 20,
+        "bytes_per_scene": current / len(scenes),
+        "load_s": elapsed,
+        "distinct_backgrounds": len({id(scene["background"]) for scene in scenes}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory of parsed scenes, json dicts against SceneRecords.")
+    parser.add_argument("--scenes", type=int, default=100000)
+    parser.add_argument("--text-length", type=int, default=160)
+    parser.add_argument("--images", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", default="", help="Write results to this file.")
+    args = parser.parse_args()
+
+    sources = scene_sources(args.scenes, args.text_length, args.images, args.seed)
+    results = {"config": vars(args), "dict": measure(sources, dict), "record": measure(sources, SceneRecord.from_dict)}
+
+    print(f"{'layout':<10}{'MB':>9}{'peak MB':>10}{'B/scene':>10}{'load s':>9}{'bg objects':>12}")
+    for name in ("dict", "record"):
+        row = results[name]
+        print(f"{name:<10}{row['mb']:>9.1f}{row['peak_mb']:>10.1f}{row['bytes_per_scene']:>10.0f}"
+              f"{row['load_s']:>9.2f}{row['distinct_backgrounds']:>12}")
+    print(f"records use {results['record']['mb'] / results['dict']['mb']:.0%} of the dict memory")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# Time to first frame from a cold interpreter, for a text-only novel and one with images.
+# python3 -m benchmarks.startup_bench --repeat 5
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.headless import generate_novel
+
+# runs in a fresh interpreter inside the novel directory and prints its timings as json
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+from benchmarks.headless import HeadlessEngine
+imported = time.perf_counter()
+engine = HeadlessEngine()
+created = time.perf_counter()
+engine.register_scenes()
+engine.apply_lua_logic()
+engine.render(engine.show_tab)
+first_frame = time.perf_counter()
+engine.exit()
+heavy = [name for name in ("numpy", "cv2", "pygame", "lupa") if name in sys.modules]
+print(json.dumps({"import_ms": (imported - start) * 1e3, "init_ms": (created - imported) * 1e3,
+                  "first_frame_ms": (first_frame - created) * 1e3, "total_ms": (first_frame - start) * 1e3,
+                  "modules": heavy}))
+"""
+
+
+def probe(root: str, repeat: int) -> dict:
+    env = dict(os.environ, PYTHONPATH=os.getcwd() + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", PROBE], cwd=root, env=env, capture_output=True, text=True, check=True)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    result = {key: sorted(run[key] for run in runs)[len(runs) // 2] for key in runs[0] if key != "modules"}
+    result["modules"] = runs[-1]["modules"]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Engine startup benchmark.")
+    parser.add_argument("--scenes", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'novel':<12}{'import ms':>11}{'init ms':>10}{'frame ms':>10}{'total ms':>10}  loaded")
+    for name, images, scripts in (("text-only", 0, 0.0), ("images", 4, 0.25)):
+        with tempfile.TemporaryDirectory() as root:
+            generate_novel(root, args.scenes, images=images, script_density=scripts, music_density=0.0)
+            row = probe(root, args.repeat)
+        print(f"{name:<12}{row['import_ms']:>11.1f}{row['init_ms']:>10.1f}{row['first_frame_ms']:>10.1f}"
+              f"{row['total_ms']:>10.1f}  {', '.join(row['modules']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
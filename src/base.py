@@ -1,42 +1,120 @@
-import numpy as np
-from rich.console import Console
-from lupa import LuaRuntime, lua_type
 from .capatibilities.music import *
+from .capatibilities.audio import *
 from .capatibilities.theming import *
+from .capatibilities.frame_cache import *
+from .capatibilities.prefetch import *
+from .capatibilities.framebuffer import *
+from .capatibilities.scene_store import *
+from .capatibilities.script_cache import *
+from .capatibilities.lua_bridge import *
+from .capatibilities.saving import *
+from .capatibilities.tracing import *
+from .capatibilities.history import *
 from .config import *
 from .packaging.nvlrc import NVLRCParser
+from .packaging.vfs import *
+from .packaging.grids import GridIndex
+import shutil
+
+LUA_ATTRS = ("lua", "lua_env", "scripts", "lua_type", "lua_bridge")
+
+
+def load_lupa():
+    try:
+        # lupa's default Lua 5.5 runtime can hand back the wrong Python attribute once
+        # the collector frees a name string (engine.choices -> engine.add_choice)
+        import lupa.lua54 as lupa
+    except ImportError:
+        import lupa
+    return lupa
+
 
 class EngineBase:
-    def __init__(self) -> None:
+    def __init__(self, fs=LOCAL_FS) -> None:
         logging.info("starting engine base")
+        self.fs = fs
         logging.info("starting nvlrc reading")
-        self.parser = NVLRCParser()
+        self.parser = NVLRCParser(fs=self.fs)
         self.nvl_name = self.parser.get_nvl_name()
         self.scenes_dir = self.parser.get_scene_dir()
         self.save_dir  = self.parser.get_save_file()
-        logging.info("console starting")
-        self.console = Console()
-        self.w, self.h = self.console.size
+        self.tracer = TRACER
+        self.tracer.configure(self.parser.get_trace(), self.parser.get_trace_buffer(), self.parser.get_trace_file())
+        self.saves = SaveManager(self.save_dir, self.parser.get_save_snapshot_every())
+        self.render_mode = self.parser.get_render_mode()
+        self.color_tolerance = self.parser.get_color_tolerance()
+        self.frame_byte_budget = self.parser.get_frame_byte_budget()
+        self.frame_bytes = 0
+        self.frame_cache = FrameCache(
+            self.parser.get_frame_cache_mb() * 1024 * 1024,
+            self.parser.get_frame_cache_dir(),
+        )
+        self.audio = AudioManager(
+            self.fs,
+            NullBackend() if self.parser.get_audio_backend() == "null" else PygameBackend(),
+            self.parser.get_audio_cache_mb() * 1024 * 1024,
+            self.parser.get_crossfade_ms(),
+        )
+        self.prefetcher = Prefetcher(self.parser.get_prefetch_workers())
+        self.prefetched = None
+        self.history = History(self.parser.get_history_size())
+        self.shown_frame_key = None
+        self.framebuffer = FrameBuffer()
+        self.grids = GridIndex(self.fs)
+        # the Rich console is made on first use; until then the size comes from the terminal
+        self.w, self.h = shutil.get_terminal_size((80, 25))
         logging.info("theme manager starting")
-        self.theme_manager = ThemeManager()
+        self.theme_manager = ThemeManager(self.fs)
         self.id: int = 1
         self.text: str = ""
         self.background: str = ""
         self.person: str = ""
+        self.advance_after = 0
         logging.info("loading theme")
         self.theme_manager.load_theme("main.theme")
         self.tab_height = 3
-        logging.info("starting lua runtime")
-        self.lua = LuaRuntime(unpack_returned_tuples=True) # type: ignore
-        self.scenes = []
+        self.lua_started = False
+        self.scenes = SceneStore(
+            self.scenes_dir,
+            self.parser.get_scene_cache(),
+            index_path=".scene-index.json" if isinstance(self.fs, LocalFS) else "",
+            bundle_path=self.parser.get_scene_bundle(),
+            fs=self.fs,
+        )
         self.show_tab = True
-        self.lua_env = self.lua.globals()
-        self.choices = {}
+        self.choices = ChoiceMap()
         self.music = ""
-        logging.info("starting music mixer")
-        pygame.mixer.init()
+        self.script_path = ""
+        self.script_budget = (self.parser.get_script_budget_instructions(), self.parser.get_script_budget_ms() / 1000)
+
+    def __getattr__(self, name):
+        # the Lua runtime starts when a script first needs it
+        if name in LUA_ATTRS and not self.__dict__.get("lua_started", True):
+            self.start_lua()
+            return getattr(self, name)
+        if name == "console":
+            logging.info("console starting")
+            self.console = rich_console.Console()
+            return self.console
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
+    def start_lua(self):
+        logging.info("starting lua runtime")
+        lupa = load_lupa()
+        self.lua_started = True
+        self.lua = lupa.LuaRuntime(unpack_returned_tuples=True) # type: ignore
+        self.lua_type = lupa.lua_type
+        self.lua_env = self.lua.globals()
+        self.scripts = ScriptCache(self.lua, self.fs, self.parser.get_script_profile())
 
     def exit(self):
         logging.info('exiting...')
+        self.prefetcher.shutdown()
+        self.saves.close()
+        self.audio.close()
+        self.tracer.close()
+        if self.lua_started and self.scripts.profile:
+            logging.info("script profile:\n%s", self.scripts.format_profile())
+        self.console.file.write(CURSOR_SHOW)
         self.console.clear()
         exit()
@@ -0,0 +1,187 @@
+import io
+import queue
+import threading
+from collections import OrderedDict
+from ..config import *
+from ..packaging.vfs import asset_path
+
+# imported when the first track plays; the banner would land in the middle of a frame
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+pygame = lazy_import("pygame")
+
+
+class Track:
+    __slots__ = ("path", "sound", "data", "nbytes")
+
+    def __init__(self, path: str, sound=None, data=None, nbytes: int = 0) -> None:
+        self.path = path
+        self.sound = sound
+        self.data = data
+        self.nbytes = nbytes
+
+
+class PygameBackend:
+    # tracks are decoded into Sounds so two channels can overlap while crossfading;
+    # formats the Sound decoder refuses fall back to streaming through mixer.music
+    def __init__(self) -> None:
+        self.ready = False
+        self.channel = None
+        self.streaming = False
+
+    def start(self):
+        if not self.ready:
+            logging.info("starting music mixer")
+            pygame.mixer.init()
+            pygame.mixer.set_num_channels(max(pygame.mixer.get_num_channels(), 2))
+            self.ready = True
+
+    def decode(self, path: str, data: bytes) -> Track:
+        self.start()
+        try:
+            sound = pygame.mixer.Sound(file=io.BytesIO(data))
+        except pygame.error as e:
+            logging.debug("cant decode %s into a sound (%s), it will be streamed", path, e)
+            return Track(path, data=data, nbytes=len(data))
+        frequency, size, channels = pygame.mixer.get_init()
+        return Track(path, sound=sound, nbytes=int(sound.get_length() * frequency * channels * abs(size) // 8))
+
+    def play(self, track: Track, fade_ms: int):
+        self.start()
+        self.fade_out(fade_ms)
+        if track.sound is None:
+            pygame.mixer.music.load(io.BytesIO(track.data), os.path.splitext(track.path)[1].lstrip("."))
+            pygame.mixer.music.play(-1, fade_ms=fade_ms)
+            self.streaming = True
+            return
+        self.channel = pygame.mixer.find_channel(True)
+        self.channel.play(track.sound, loops=-1, fade_ms=fade_ms)
+
+    def fade_out(self, fade_ms: int):
+        if not self.ready:
+            return
+        if self.channel is not None:
+            if fade_ms > 0:
+                self.channel.fadeout(fade_ms)
+            else:
+                self.channel.stop()
+            self.channel = None
+        if self.streaming:
+            if fade_ms > 0:
+                pygame.mixer.music.fadeout(fade_ms)
+            else:
+                pygame.mixer.music.stop()
+            self.streaming = False
+
+    def close(self):
+        if self.ready:
+            pygame.mixer.quit()
+            self.ready = False
+
+
+class NullBackend:
+    # headless runs: keeps the bookkeeping, never opens an audio device
+    def __init__(self) -> None:
+        self.played = []
+        self.decoded = 0
+
+    def decode(self, path: str, data: bytes) -> Track:
+        self.decoded += 1
+        return Track(path, data=data, nbytes=len(data))
+
+    def play(self, track: Track, fade_ms: int):
+        self.played.append(track.path)
+
+    def fade_out(self, fade_ms: int):
+        pass
+
+    def close(self):
+        pass
+
+
+class AudioManager:
+    def __init__(self, fs, backend=None, cache_bytes: int = 32 * 1024 * 1024, crossfade_ms: int = 600) -> None:
+        self.fs = fs
+        self.backend = backend if backend is not None else PygameBackend()
+        self.cache_bytes = cache_bytes
+        self.crossfade_ms = crossfade_ms
+        self.current = ""
+        self.tracks: OrderedDict = OrderedDict()
+        self.size = 0
+        self.reused = 0
+        self.loads = 0
+        self.commands: queue.Queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def _send(self, *command):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._worker, name="audio", daemon=True)
+                self.thread.start()
+        self.commands.put(command)
+
+    def play(self, file_path: str) -> bool:
+        file_path = asset_path(file_path)
+        if file_path == self.current:
+            self.reused += 1
+            return True
+        if not self.fs.exists(file_path):
+            return False
+        self.current = file_path
+        self._send("play", file_path)
+        return True
+
+    def preload(self, file_path: str):
+        file_path = asset_path(file_path)
+        if file_path and file_path != self.current and self.fs.exists(file_path):
+            self._send("preload", file_path)
+
+    def stop(self):
+        if self.current:
+            self.current = ""
+            self._send("stop")
+
+    def flush(self):
+        if self.thread is not None:
+            self.commands.join()
+
+    def close(self):
+        if self.thread is not None:
+            self._send("close")
+            self.thread.join(timeout=1)
+            self.thread = None
+
+    def _track(self, file_path: str) -> Track:
+        track = self.tracks.get(file_path)
+        if track is not None:
+            self.tracks.move_to_end(file_path)
+            return track
+        self.loads += 1
+        track = self.backend.decode(file_path, bytes(self.fs.read(file_path)))
+        if track.nbytes <= self.cache_bytes:
+            self.tracks[file_path] = track
+            self.size += track.nbytes
+            # the playing track is most recent, so eviction never cuts it off
+            while self.size > self.cache_bytes:
+                _, evicted = self.tracks.popitem(last=False)
+                self.size -= evicted.nbytes
+        return track
+
+    def _worker(self):
+        while True:
+            command = self.commands.get()
+            try:
+                action = command[0]
+                if action == "play":
+                    self.backend.play(self._track(command[1]), self.crossfade_ms)
+                elif action == "preload":
+                    self._track(command[1])
+                elif action == "stop":
+                    self.backend.fade_out(self.crossfade_ms)
+                elif action == "close":
+                    self.backend.close()
+                    return
+            except Exception as e:
+                logging.warning("audio %s failed: %s", command, e)
+            finally:
+                self.commands.task_done()
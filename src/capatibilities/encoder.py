@@ -0,0 +1,97 @@
+from __future__ import annotations
+from functools import lru_cache
+from ..config import *
+
+SGR_RESET = "\x1b[0m"
+
+BUDGET_TOLERANCES = (8, 16, 32, 64, 128)
+
+
+@lru_cache(maxsize=None)
+def sgr_tables() -> tuple:
+    # per-channel lookup tables, indexed directly by uint8 color values
+    dec = np.array([str(i) for i in range(256)], dtype=object)
+    return "\x1b[38;2;" + dec, ";" + dec, ";48;2;" + dec, ";" + dec + "m", "\x1b[48;2;" + dec
+
+
+def encode_rich(pixels: np.ndarray, avg_colors: np.ndarray, symbols: np.ndarray) -> str:
+    output = []
+    for row_pixels, row_avg_colors, row_symbols in zip(pixels, avg_colors, symbols):
+        line = "".join(
+            f"[#{r:02x}{g:02x}{b:02x} on #{rb:02x}{gb:02x}{bb:02x}]{s}[/]"
+            for (r, g, b), (rb, gb, bb), s in zip(row_pixels, row_avg_colors, row_symbols)
+        )
+        output.append(line)
+    return "\n".join(output)
+
+
+def quantize(colors: np.ndarray, tolerance: int) -> np.ndarray:
+    if tolerance <= 0:
+        return colors
+    step = tolerance + 1
+    snapped = (colors.astype(np.int32) // step) * step + step // 2
+    return np.minimum(snapped, 255).astype(np.uint8)
+
+
+def encode_cells(pixels: np.ndarray, avg_colors: np.ndarray, symbols: np.ndarray, starts=None) -> np.ndarray:
+    # cells are coalesced in flat order: a cell only carries the SGR parts that differ from its
+    # left neighbour, except at run starts (defaults to the first cell) which always get both
+    fg = pixels.reshape(-1, 3).astype(np.intp)
+    bg = avg_colors.reshape(-1, 3).astype(np.intp)
+    cells = symbols.reshape(-1).astype(object)
+    if cells.size == 0:
+        return cells
+
+    fg_new = np.ones(cells.size, dtype=bool)
+    bg_new = np.ones(cells.size, dtype=bool)
+    fg_new[1:] = (fg[1:] != fg[:-1]).any(axis=1)
+    bg_new[1:] = (bg[1:] != bg[:-1]).any(axis=1)
+    if starts is not None:
+        fg_new[starts] = True
+        bg_new[starts] = True
+    else:
+        fg_new[0] = bg_new[0] = True
+
+    sgr_fg, sgr_sep, sgr_bg, sgr_end, sgr_bg_only = sgr_tables()
+    both = fg_new & bg_new
+    fg_only = fg_new & ~bg_new
+    bg_only = bg_new & ~fg_new
+    if both.any():
+        f, b = fg[both], bg[both]
+        cells[both] = (
+            sgr_fg[f[:, 0]] + sgr_sep[f[:, 1]] + sgr_sep[f[:, 2]]
+            + sgr_bg[b[:, 0]] + sgr_sep[b[:, 1]] + sgr_end[b[:, 2]]
+            + cells[both]
+        )
+    if fg_only.any():
+        f = fg[fg_only]
+        cells[fg_only] = sgr_fg[f[:, 0]] + sgr_sep[f[:, 1]] + sgr_end[f[:, 2]] + cells[fg_only]
+    if bg_only.any():
+        b = bg[bg_only]
+        cells[bg_only] = sgr_bg_only[b[:, 0]] + sgr_sep[b[:, 1]] + sgr_end[b[:, 2]] + cells[bg_only]
+    return cells
+
+
+def encode_ansi(pixels: np.ndarray, avg_colors: np.ndarray, symbols: np.ndarray) -> bytes:
+    if pixels.size == 0:
+        return b""
+    height, width = symbols.shape
+    cells = encode_cells(pixels, avg_colors, symbols, np.arange(0, height * width, width)).reshape(height, width)
+    line_ends = np.full((height, 1), SGR_RESET + "\n", dtype=object)
+    line_ends[-1, 0] = SGR_RESET
+    return "".join(np.concatenate([cells, line_ends], axis=1).ravel().tolist()).encode("utf-8")
+
+
+def encode_budgeted(pixels: np.ndarray, avg_colors: np.ndarray, symbols: np.ndarray,
+                    tolerance: int = 0, budget: int = 0):
+    # raises the color tolerance step by step until the frame fits into budget bytes
+    steps = [tolerance] + [t for t in BUDGET_TOLERANCES if t > tolerance]
+    for step in steps:
+        q_pixels = quantize(pixels, step)
+        q_avg_colors = quantize(avg_colors, step)
+        payload = encode_ansi(q_pixels, q_avg_colors, symbols)
+        if not budget or len(payload) <= budget:
+            break
+    else:
+        logging.warning(f"frame is {len(payload)} bytes even at tolerance {step}, budget is {budget}")
+    return q_pixels, q_avg_colors, payload
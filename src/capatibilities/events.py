@@ -0,0 +1,138 @@
+import asyncio
+import re
+import signal
+import sys
+import threading
+from ..config import *
+
+ADVANCE = "advance"
+RESIZE = "resize"
+QUIT = "quit"
+BACK = "back"
+ADVANCE_KEYS = (b"\n", b"\r", b" ")
+# left arrow, backspace, b
+BACK_KEYS = (b"\x1b[D", b"\x7f", b"b")
+KEY_EVENTS = {**dict.fromkeys(ADVANCE_KEYS, ADVANCE), **dict.fromkeys(BACK_KEYS, BACK)}
+# one read can hold several keys; they are matched left to right so events keep their order
+KEY_PATTERN = re.compile(b"|".join(re.escape(key) for key in sorted(KEY_EVENTS, key=len, reverse=True)))
+# a window drag fires SIGWINCH many times, only the size it settles on is rendered
+RESIZE_SETTLE = 0.05
+RESIZE_POLL = 0.5
+
+
+class EventSource:
+    # feeds advance and resize events into the game loop's queue. A real terminal is read
+    # key by key through the event loop; anything else (pipes, scripted input, Windows)
+    # goes through the blocking read_input on a daemon thread, one call per wait.
+    def __init__(self, read_input, keyboard: bool, size) -> None:
+        self.read_input = read_input
+        self.keyboard = keyboard
+        self.size = size
+        self.queue = None
+        self.loop = None
+        self.saved_tty = None
+        self.fd = -1
+        self.wanted = threading.Event()
+        self.reader = None
+        self.poller = None
+        self.resize_pending = False
+        self.signal_installed = False
+
+    def start(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue) -> None:
+        self.loop = loop
+        self.queue = queue
+        if self.keyboard and not self._start_keyboard():
+            self.keyboard = False
+        if not self.keyboard:
+            self.reader = threading.Thread(target=self._read_blocking, name="input", daemon=True)
+            self.reader.start()
+        try:
+            loop.add_signal_handler(signal.SIGWINCH, self.resized)
+            self.signal_installed = True
+        except (AttributeError, NotImplementedError, RuntimeError, ValueError):
+            self.poller = loop.create_task(self._poll_size())
+
+    def stop(self) -> None:
+        if self.loop is None:
+            return
+        if self.signal_installed:
+            self.loop.remove_signal_handler(signal.SIGWINCH)
+            self.signal_installed = False
+        if self.poller is not None:
+            self.poller.cancel()
+            self.poller = None
+        if self.keyboard and self.saved_tty is not None:
+            import termios
+            # exit() has usually closed sys.stdin by now, the descriptor itself is still open
+            self.loop.remove_reader(self.fd)
+            termios.tcsetattr(self.fd, termios.TCSADRAIN, self.saved_tty)
+            self.saved_tty = None
+        self.loop = None
+
+    def want_input(self) -> None:
+        if not self.keyboard:
+            self.wanted.set()
+
+    def resized(self) -> None:
+        if not self.resize_pending:
+            self.resize_pending = True
+            self.queue.put_nowait(RESIZE)
+
+    async def settle_resize(self) -> None:
+        await asyncio.sleep(RESIZE_SETTLE)
+        self.resize_pending = False
+
+    def _start_keyboard(self) -> bool:
+        try:
+            import termios
+            fd = self.fd = sys.stdin.fileno()
+            self.saved_tty = termios.tcgetattr(fd)
+            mode = termios.tcgetattr(fd)
+            mode[3] &= ~(termios.ECHO | termios.ICANON)
+            mode[6][termios.VMIN] = 1
+            mode[6][termios.VTIME] = 0
+            termios.tcsetattr(fd, termios.TCSADRAIN, mode)
+            self.loop.add_reader(fd, self._read_keys, fd)
+            return True
+        except (ImportError, OSError, ValueError, NotImplementedError, AttributeError) as e:
+            logging.info("keyboard reader unavailable (%s), using blocking input", e)
+            if self.saved_tty is not None:
+                termios.tcsetattr(self.fd, termios.TCSADRAIN, self.saved_tty)
+                self.saved_tty = None
+            return False
+
+    def _read_keys(self, fd: int) -> None:
+        data = os.read(fd, 1024)
+        if not data:
+            self.loop.remove_reader(fd)
+            self.queue.put_nowait(QUIT)
+            return
+        for match in KEY_PATTERN.finditer(data):
+            self.queue.put_nowait(KEY_EVENTS[match.group()])
+
+    def _read_blocking(self) -> None:
+        while True:
+            self.wanted.wait()
+            self.wanted.clear()
+            try:
+                line = self.read_input(prompt="")
+            except EOFError:
+                logging.info("input closed")
+                event = QUIT
+            else:
+                event = BACK if isinstance(line, str) and line.strip().lower() == "b" else ADVANCE
+            loop = self.loop
+            if loop is None:
+                return
+            loop.call_soon_threadsafe(self.queue.put_nowait, event)
+            if event == QUIT:
+                return
+
+    async def _poll_size(self) -> None:
+        last = self.size()
+        while True:
+            await asyncio.sleep(RESIZE_POLL)
+            size = self.size()
+            if size != last:
+                last = size
+                self.resized()
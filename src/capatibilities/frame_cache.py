@@ -0,0 +1,129 @@
+from __future__ import annotations
+import hashlib
+import threading
+from collections import OrderedDict
+from ..config import *
+
+
+class Frame:
+    __slots__ = ("pixels", "avg_colors", "symbols", "payload")
+
+    def __init__(self, pixels: np.ndarray, avg_colors: np.ndarray, symbols: np.ndarray, payload):
+        self.pixels = pixels
+        self.avg_colors = avg_colors
+        self.symbols = symbols
+        self.payload = payload
+
+    @property
+    def nbytes(self) -> int:
+        return self.pixels.nbytes + self.avg_colors.nbytes + self.symbols.nbytes + len(self.payload)
+
+
+class FrameCache:
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, disk_dir: str = "") -> None:
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.frames: OrderedDict = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(fs, file_path: str, w: int, h: int, tab_height: int, mode: str, *options) -> tuple:
+        mtime, size = fs.stat(file_path)
+        return (fs.realpath(file_path), mtime, size, w, h, tab_height, mode, *options)
+
+    def get(self, key: tuple):
+        with self.lock:
+            frame = self.frames.get(key)
+            if frame is not None:
+                self.frames.move_to_end(key)
+                self.hits += 1
+                return frame
+        frame = self._load_disk(key)
+        with self.lock:
+            if frame is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        self._insert(key, frame)
+        return frame
+
+    def put(self, key: tuple, frame: Frame):
+        self._insert(key, frame)
+        self._store_disk(key, frame)
+
+    def clear(self):
+        with self.lock:
+            self.frames.clear()
+            self.size = 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "frames": len(self.frames),
+                "bytes": self.size,
+            }
+
+    def _insert(self, key: tuple, frame: Frame):
+        nbytes = frame.nbytes
+        with self.lock:
+            if nbytes > self.max_bytes:
+                return
+            old = self.frames.pop(key, None)
+            if old is not None:
+                self.size -= old.nbytes
+            self.frames[key] = frame
+            self.size += nbytes
+            while self.size > self.max_bytes:
+                _, evicted = self.frames.popitem(last=False)
+                self.size -= evicted.nbytes
+                self.evictions += 1
+
+    def _disk_path(self, key: tuple) -> str:
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.disk_dir, f"{digest}.npz")
+
+    def _load_disk(self, key: tuple):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as blob:
+                payload = blob["payload"].tobytes()
+                if key[6] == "rich":
+                    payload = payload.decode("utf-8")
+                return Frame(blob["pixels"], blob["avg_colors"], blob["symbols"], payload)
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"broken frame cache entry {path}: {e}")
+            return None
+
+    def _store_disk(self, key: tuple, frame: Frame):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        payload = frame.payload.encode("utf-8") if isinstance(frame.payload, str) else frame.payload
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                np.savez(
+                    f,
+                    pixels=frame.pixels,
+                    avg_colors=frame.avg_colors,
+                    symbols=frame.symbols,
+                    payload=np.frombuffer(payload, dtype=np.uint8),
+                )
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"cant write frame cache entry {path}: {e}")
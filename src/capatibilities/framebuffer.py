@@ -0,0 +1,116 @@
+from ..config import *
+from .encoder import *
+
+SYNC_BEGIN = "\x1b[?2026h"
+SYNC_END = "\x1b[?2026l"
+CURSOR_HOME = "\x1b[H"
+CURSOR_HIDE = "\x1b[?25l"
+CURSOR_SHOW = "\x1b[?25h"
+CLEAR_SCREEN = "\x1b[2J"
+CLEAR_BELOW = "\x1b[J"
+CLEAR_LINE_END = "\x1b[K"
+
+
+def move_to(row: int, col: int) -> str:
+    return f"\x1b[{row + 1};{col + 1}H"
+
+
+class FrameBuffer:
+    # above this share of changed cells a plain repaint is cheaper than cursor jumps
+    REPAINT_RATIO = 0.5
+
+    def __init__(self) -> None:
+        self.reset()
+        self.last_bytes = 0
+        self.full_repaints = 0
+        self.diff_repaints = 0
+
+    def reset(self):
+        self.size = None
+        self.pixels = None
+        self.avg_colors = None
+        self.symbols = None
+        self.lines = []
+
+    def update(self, frame, lines: list, size: tuple) -> bytes:
+        shape = None if frame is None else frame.symbols.shape
+        prev_shape = None if self.symbols is None else self.symbols.shape
+        if self.size != size or shape != prev_shape:
+            out = self._repaint(frame, lines)
+        else:
+            out = [SYNC_BEGIN]
+            if frame is not None:
+                out.extend(self._diff_image(frame))
+            out.extend(self._diff_lines(lines, 0 if shape is None else shape[0]))
+            out.append(CURSOR_HOME)
+            out.append(SYNC_END)
+            self.diff_repaints += 1
+
+        self.size = size
+        if frame is None:
+            self.pixels = self.avg_colors = self.symbols = None
+        else:
+            self.pixels, self.avg_colors, self.symbols = frame.pixels, frame.avg_colors, frame.symbols
+        self.lines = lines
+        data = b"".join(p if isinstance(p, bytes) else p.encode("utf-8") for p in out)
+        self.last_bytes = len(data)
+        return data
+
+    def _repaint(self, frame, lines: list) -> list:
+        out = [SYNC_BEGIN, CURSOR_HIDE, CURSOR_HOME, CLEAR_SCREEN]
+        row = 0
+        if frame is not None:
+            out.append(frame.payload)
+            row = frame.symbols.shape[0]
+        for i, line in enumerate(lines):
+            out.append(move_to(row + i, 0))
+            out.append(line)
+        out.append(CURSOR_HOME)
+        out.append(SYNC_END)
+        self.full_repaints += 1
+        return out
+
+    def _diff_image(self, frame) -> list:
+        changed = frame.symbols != self.symbols
+        changed |= (frame.pixels != self.pixels).any(axis=-1)
+        changed |= (frame.avg_colors != self.avg_colors).any(axis=-1)
+        count = int(np.count_nonzero(changed))
+        if count == 0:
+            return []
+        if count > changed.size * self.REPAINT_RATIO:
+            return [CURSOR_HOME, frame.payload]
+
+        height, width = changed.shape
+        # a false column between rows keeps runs from wrapping across lines
+        padded = np.zeros((height, width + 1), dtype=np.int8)
+        padded[:, :width] = changed
+        edges = np.diff(np.concatenate([[0], padded.ravel()]))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        run_offsets = np.concatenate([[0], np.cumsum(ends - starts)[:-1]])
+        cells = encode_cells(
+            frame.pixels[changed], frame.avg_colors[changed], frame.symbols[changed], run_offsets
+        )
+
+        out = []
+        offset = 0
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            row, col = divmod(start, width + 1)
+            length = end - start
+            out.append(move_to(row, col))
+            out.append("".join(cells[offset:offset + length].tolist()))
+            out.append(SGR_RESET)
+            offset += length
+        return out
+
+    def _diff_lines(self, lines: list, top: int) -> list:
+        out = []
+        for i, line in enumerate(lines):
+            if i >= len(self.lines) or self.lines[i] != line:
+                out.append(move_to(top + i, 0))
+                out.append(line)
+                out.append(CLEAR_LINE_END)
+        if len(lines) < len(self.lines):
+            out.append(move_to(top + len(lines), 0))
+            out.append(CLEAR_BELOW)
+        return out
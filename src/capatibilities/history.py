@@ -0,0 +1,49 @@
+from collections import deque
+from typing import NamedTuple
+from ..config import *
+
+
+class Snapshot(NamedTuple):
+    # what the player saw: scene state after its scripts ran, the choices at that
+    # moment and the key of the frame on screen, so going back runs no script; the frame
+    # itself stays in the frame cache and under its budget
+    id: int
+    text: str
+    person: str
+    background: str
+    music: str
+    show_tab: bool
+    advance_after: float
+    choices: dict
+    frame_key: tuple
+
+
+class History:
+    def __init__(self, size: int = 100) -> None:
+        self.snapshots: deque = deque(maxlen=max(size, 1))
+
+    def __len__(self) -> int:
+        return len(self.snapshots)
+
+    def push(self, snapshot: Snapshot):
+        # re-rendering the same scene (resize, a script repaint) replaces its entry
+        if self.snapshots and self.snapshots[-1].id == snapshot.id:
+            self.snapshots[-1] = snapshot
+        else:
+            self.snapshots.append(snapshot)
+
+    def rewind(self, steps: int = 1):
+        if steps < 1 or steps >= len(self.snapshots):
+            return None
+        for _ in range(steps):
+            self.snapshots.pop()
+        return self.snapshots[-1]
+
+    def steps_to(self, scene_id: int):
+        for steps, snapshot in enumerate(reversed(self.snapshots)):
+            if snapshot.id == scene_id:
+                return steps
+        return None
+
+    def clear(self):
+        self.snapshots.clear()
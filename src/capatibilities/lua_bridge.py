@@ -0,0 +1,197 @@
+from collections.abc import Mapping, MutableMapping
+from ..config import *
+
+SCENE_FIELDS = ("id", "text", "background", "person", "music", "show_tab", "choices", "advance_after")
+
+# Built once per runtime. `scene` is a persistent table whose fields read and write
+# engine attributes directly; choice helpers are plain Lua functions over engine.choices.
+BRIDGE_LUA = """
+local engine, cv, fields = ...
+local methods = { cv = cv }
+
+function methods.add_choice(name, choice)
+    engine.choices[name] = choice
+end
+
+function methods.get_choice(name)
+    return engine.choices[name]
+end
+
+function methods.delete_choice(name)
+    if engine.choices[name] == nil then
+        error("attempt delete of uncreated choice " .. tostring(name))
+    end
+    engine.choices[name] = nil
+end
+
+local scene = setmetatable({}, {
+    __index = function(_, key)
+        if fields[key] then
+            return engine[key]
+        end
+        return methods[key]
+    end,
+    __newindex = function(self, key, value)
+        if key == "choices" then
+            engine.set_choices(value)
+        elseif fields[key] then
+            engine[key] = value
+        else
+            rawset(self, key, value)
+        end
+    end,
+})
+
+local function apply(fn)
+    local result = fn(scene)
+    if type(result) == "table" and not rawequal(result, scene) then
+        for key in pairs(fields) do
+            local value = rawget(result, key)
+            if value ~= nil then
+                scene[key] = value
+            end
+        end
+        return nil
+    end
+    return result
+end
+
+return scene, apply
+"""
+
+
+# marks a choice removed in a FrozenChoices version
+DELETED = object()
+
+
+class FrozenChoices(Mapping):
+    # one read-only version of the choices: what changed since `parent`, so versions share
+    # everything before them; once a chain holds more changes than the map has entries
+    # the next version starts over from a flat copy, which keeps freezing O(1) amortized
+    __slots__ = ("parent", "changes", "size", "pending")
+
+    def __init__(self, parent, changes: dict, size: int) -> None:
+        self.parent = parent
+        self.changes = changes
+        self.size = size
+        self.pending = parent.pending + len(changes) if parent is not None else 0
+
+    def __getitem__(self, key):
+        version = self
+        while version is not None:
+            if key in version.changes:
+                value = version.changes[key]
+                if value is DELETED:
+                    break
+                return value
+            version = version.parent
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.to_dict())
+
+    def __len__(self) -> int:
+        return self.size
+
+    def to_dict(self) -> dict:
+        chain = []
+        version = self
+        while version is not None:
+            chain.append(version.changes)
+            version = version.parent
+        choices = {}
+        for changes in reversed(chain):
+            for key, value in changes.items():
+                if value is DELETED:
+                    choices.pop(key, None)
+                else:
+                    choices[key] = value
+        return choices
+
+
+class ChoiceMap(MutableMapping):
+    # missing choices read as nil in Lua and assigning nil deletes, like a Lua table;
+    # touched names are remembered so saves can write only what changed, and history
+    # gets what changed since the last freeze(). A map thawed from a FrozenChoices
+    # reads through it and copies it on the first write
+    __slots__ = ("data", "changed", "frozen", "delta")
+
+    def __init__(self, *args, **kwargs) -> None:
+        self.data = dict(*args, **kwargs)
+        self.changed = set()
+        self.frozen = None
+        self.delta = {}
+
+    @classmethod
+    def thaw(cls, frozen: FrozenChoices) -> "ChoiceMap":
+        choices = cls()
+        choices.data = None
+        choices.frozen = frozen
+        return choices
+
+    def _own(self) -> dict:
+        if self.data is None:
+            self.data = self.frozen.to_dict()
+        return self.data
+
+    def __getitem__(self, key):
+        return self.get(key)
+
+    def get(self, key, default=None):
+        if self.data is None:
+            return self.frozen.get(key, default)
+        return self.data.get(key, default)
+
+    def __contains__(self, key) -> bool:
+        return key in (self.frozen if self.data is None else self.data)
+
+    def __len__(self) -> int:
+        return len(self.frozen if self.data is None else self.data)
+
+    def __iter__(self):
+        return iter(self._own())
+
+    def __setitem__(self, key, value):
+        data = self._own()
+        self.changed.add(key)
+        if value is None:
+            data.pop(key, None)
+            self.delta[key] = DELETED
+        else:
+            data[key] = value
+            self.delta[key] = value
+
+    def __delitem__(self, key):
+        del self._own()[key]
+        self.changed.add(key)
+        self.delta[key] = DELETED
+
+    def pop(self, key, *default):
+        self.changed.add(key)
+        self.delta[key] = DELETED
+        return self._own().pop(key, *default)
+
+    def __repr__(self) -> str:
+        return repr(self.frozen.to_dict() if self.data is None else self.data)
+
+    def freeze(self) -> FrozenChoices:
+        # history snapshots share one version until the next write
+        frozen = self.frozen
+        if frozen is None or frozen.pending + len(self.delta) > len(self):
+            self.frozen = FrozenChoices(None, dict(self._own()), len(self))
+        elif self.delta:
+            self.frozen = FrozenChoices(frozen, self.delta, len(self))
+        self.delta = {}
+        return self.frozen
+
+    def drain_changes(self):
+        updated = {key: self[key] for key in self.changed if key in self}
+        deleted = [key for key in self.changed if key not in self]
+        self.changed = set()
+        return updated, deleted
+
+
+class LuaBridge:
+    def __init__(self, lua, engine, cv=None) -> None:
+        fields = lua.table_from({name: True for name in SCENE_FIELDS})
+        self.scene, self.apply = lua.compile(BRIDGE_LUA, name="=bridge")(engine, cv, fields)
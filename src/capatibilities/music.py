@@ -1,16 +1,15 @@
-import pygame
-import os
 from ..config import *
 
 class MusicManager:
     def play_audio(self, file_path):
-        logging.debug(f"playing audio {file_path}")
-        if os.path.exists(file_path):
-            pygame.mixer.music.load(file_path)
-            pygame.mixer.music.play(-1)
-        else:
+        logging.debug("playing audio %s", file_path)
+        # returns at once, loading and crossfading happen on the audio thread
+        if not self.audio.play(file_path):
             print(f"[ERROR] Аудиофайл {file_path} не найден")
 
+    def preload_audio(self, file_path):
+        self.audio.preload(file_path)
+
     def stop_audio(self):
         logging.debug("stopping audio")
-        pygame.mixer.music.stop()
\ No newline at end of file
+        self.audio.stop()
@@ -0,0 +1,110 @@
+import re
+import unicodedata
+from functools import lru_cache
+from ..config import *
+
+# text Rich would interpret: markup tags and :emoji: codes go through Rich, plain text does not
+MARKUP = re.compile(r"\[|:[a-z0-9_+-]+:", re.IGNORECASE)
+COLOR_CODES = {
+    "black": 30, "red": 31, "green": 32, "yellow": 33, "blue": 34, "magenta": 35, "cyan": 36, "white": 37,
+    "bright_black": 90, "bright_red": 91, "bright_green": 92, "bright_yellow": 93,
+    "bright_blue": 94, "bright_magenta": 95, "bright_cyan": 96, "bright_white": 97,
+}
+
+
+def needs_rich(*texts: str) -> bool:
+    return any(MARKUP.search(text) for text in texts)
+
+
+def color_sgr(style: str) -> str:
+    if style.startswith("#") and len(style) == 7:
+        r, g, b = (int(style[i:i + 2], 16) for i in (1, 3, 5))
+        return f"\x1b[38;2;{r};{g};{b}m"
+    return f"\x1b[{COLOR_CODES.get(style, 37)}m"
+
+
+@lru_cache(maxsize=4096)
+def char_width(char: str) -> int:
+    if unicodedata.combining(char) or unicodedata.category(char) in ("Mn", "Me", "Cf", "Cc"):
+        return 0
+    # wide and fullwidth characters (CJK, most emoji) take two terminal cells
+    return 2 if unicodedata.east_asian_width(char) in ("W", "F") else 1
+
+
+def text_width(text: str) -> int:
+    if text.isascii():
+        return len(text)
+    return sum(char_width(char) for char in text)
+
+
+def chop(word: str, width: int) -> list:
+    pieces, piece, piece_width = [], "", 0
+    for char in word:
+        w = char_width(char)
+        if piece and piece_width + w > width:
+            pieces.append(piece)
+            piece, piece_width = "", 0
+        piece += char
+        piece_width += w
+    pieces.append(piece)
+    return pieces
+
+
+def wrap_line(line: str, width: int) -> list:
+    # greedy word wrap in terminal cells; words wider than a row are cut, which also
+    # covers CJK runs that have no spaces to break on
+    rows, row, row_width = [], "", 0
+    for word in line.split():
+        word_width = text_width(word)
+        if row and row_width + 1 + word_width <= width:
+            row += " " + word
+            row_width += 1 + word_width
+            continue
+        if row:
+            rows.append(row)
+        if word_width <= width:
+            row, row_width = word, word_width
+            continue
+        *full, row = chop(word, width)
+        rows.extend(full)
+        row_width = text_width(row)
+    if row or not rows:
+        rows.append(row)
+    return rows
+
+
+@lru_cache(maxsize=1024)
+def wrap_text(text: str, width: int) -> tuple:
+    if not text:
+        return ("",)
+    width = max(width, 1)
+    return tuple(row for line in text.expandtabs(8).splitlines() for row in wrap_line(line, width))
+
+
+def fit(label: str, width: int) -> str:
+    if text_width(label) <= width:
+        return label
+    return chop(label, max(width - 1, 1))[0] + "…"
+
+
+def edge(left: str, label: str, right: str, width: int) -> str:
+    fill = width - 2
+    if not label or fill < 6:
+        return left + "─" * fill + right
+    label = f" {fit(label, fill - 4)} "
+    excess = fill - 2 - text_width(label)
+    return f"{left}─{'─' * (excess // 2)}{label}{'─' * (excess - excess // 2)}─{right}"
+
+
+@lru_cache(maxsize=256)
+def render_panel(title: str, text: str, subtitle: str, width: int, sgr: str = "") -> tuple:
+    # the same square box Rich draws, written out directly; returns the rows and their count
+    reset = "\x1b[0m" if sgr else ""
+    width = max(width, 4)
+    inner = width - 4
+    side = f"{sgr}│{reset}"
+    lines = [f"{sgr}{edge('┌', title, '┐', width)}{reset}"]
+    for row in wrap_text(text, inner):
+        lines.append(f"{side} {row}{' ' * (inner - text_width(row))} {side}")
+    lines.append(f"{sgr}{edge('└', subtitle, '┘', width)}{reset}")
+    return "\n".join(lines) + "\n", len(lines)
@@ -0,0 +1,67 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+from ..config import *
+
+
+class PrefetchedScene:
+    __slots__ = ("id", "background", "frame_key", "frame", "tab_key", "tab", "music")
+
+    def __init__(self, scene_id: int) -> None:
+        self.id = scene_id
+        self.background = ""
+        self.frame_key = None
+        self.frame = None
+        self.tab_key = None
+        self.tab = None
+        self.music = ""
+
+
+class Prefetcher:
+    def __init__(self, workers: int = 2) -> None:
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch") if workers > 0 else None
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.pool is not None
+
+    def submit(self, scene_id: int, fn, *args):
+        if self.pool is None:
+            return None
+        with self.lock:
+            if scene_id in self.pending:
+                return self.pending[scene_id]
+            future = self.pool.submit(fn, *args)
+            self.pending[scene_id] = future
+            return future
+
+    def future(self, scene_id: int):
+        with self.lock:
+            return self.pending.get(scene_id)
+
+    def take(self, scene_id: int):
+        with self.lock:
+            future = self.pending.pop(scene_id, None)
+        if future is None:
+            return None
+        try:
+            return future.result()
+        except CancelledError:
+            return None
+        except Exception as e:
+            logging.warning(f"prefetch of scene {scene_id} failed: {e}")
+            return None
+
+    def invalidate(self, scene_id=None):
+        with self.lock:
+            ids = list(self.pending) if scene_id is None else [scene_id]
+            for i in ids:
+                future = self.pending.pop(i, None)
+                if future is not None:
+                    future.cancel()
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.invalidate()
+            self.pool.shutdown(wait=False, cancel_futures=True)
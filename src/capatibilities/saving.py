@@ -0,0 +1,150 @@
+import threading
+from json import load, loads, dump, dumps, JSONDecodeError
+from ..config import *
+
+
+class SaveManager:
+    def __init__(self, path: str, snapshot_every: int = 50) -> None:
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.snapshot_every = max(1, snapshot_every)
+        self.cond = threading.Condition()
+        self.pending = None
+        self.writing = False
+        self.closed = False
+        self.tracked_choices = None
+        self.since_snapshot = 0
+        self.snapshots = 0
+        self.journal_entries = 0
+        self.failed = False
+        # every snapshot gets the next generation and journal lines carry the one they
+        # extend, so lines left behind by a crash before the journal was removed are skipped
+        self.generation = self._stored_generation()
+        self.thread = threading.Thread(target=self._worker, name="save-writer", daemon=True)
+        self.thread.start()
+
+    def save(self, fields: dict, choices):
+        updated, deleted = choices.drain_changes()
+        full = None
+        # the writer thread sets `failed`, so it is read and cleared under the lock
+        with self.cond:
+            failed, self.failed = self.failed, False
+        # a replaced choices map has no record of what it dropped, so it needs a snapshot;
+        # so does the save after a failed write, whose changes never reached the disk
+        if choices is not self.tracked_choices or failed or self.since_snapshot >= self.snapshot_every:
+            full = dict(choices)
+            self.tracked_choices = choices
+            self.since_snapshot = 0
+        else:
+            self.since_snapshot += 1
+
+        with self.cond:
+            if self.pending is None:
+                self.pending = {"fields": fields, "full": full, "updated": updated, "deleted": set(deleted)}
+            else:
+                pending = self.pending
+                pending["fields"] = fields
+                if full is not None:
+                    pending.update(full=full, updated={}, deleted=set())
+                elif pending["full"] is not None:
+                    pending["full"].update(updated)
+                    for key in deleted:
+                        pending["full"].pop(key, None)
+                else:
+                    pending["updated"].update(updated)
+                    pending["deleted"].difference_update(updated)
+                    for key in deleted:
+                        pending["updated"].pop(key, None)
+                        pending["deleted"].add(key)
+            self.cond.notify_all()
+
+    def flush(self):
+        with self.cond:
+            while self.pending is not None or self.writing:
+                self.cond.wait()
+
+    def close(self):
+        self.flush()
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        self.thread.join()
+
+    def _worker(self):
+        while True:
+            with self.cond:
+                while self.pending is None and not self.closed:
+                    self.cond.wait()
+                if self.pending is None:
+                    return
+                job, self.pending = self.pending, None
+                self.writing = True
+            try:
+                if job["full"] is not None:
+                    self._write_snapshot(dict(job["fields"], choices=job["full"]))
+                else:
+                    self._append_journal(job)
+            except Exception as e:
+                # anything not json serializable (a Lua table in a choice) fails here too;
+                # the writer has to survive it or flush() and close() would wait forever
+                logging.critical(f"error while saving: {e}")
+                with self.cond:
+                    self.failed = True
+            finally:
+                with self.cond:
+                    self.writing = False
+                    self.cond.notify_all()
+
+    def _stored_generation(self) -> int:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return int(load(f).get("generation", 0))
+        except (OSError, ValueError, TypeError, AttributeError):
+            return 0
+
+    def _write_snapshot(self, state: dict):
+        state["generation"] = self.generation + 1
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            dump(state, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.generation = state["generation"]
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self.snapshots += 1
+        logging.debug("save snapshot written to %s", self.path)
+
+    def _append_journal(self, job: dict):
+        entry = {
+            "generation": self.generation,
+            "fields": job["fields"],
+            "choices": job["updated"],
+            "deleted": sorted(job["deleted"], key=str),
+        }
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(dumps(entry) + "\n")
+        self.journal_entries += 1
+
+    def load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            state = load(f)
+        if not os.path.exists(self.journal_path):
+            return state
+        generation = state.get("generation", 0)
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = loads(line)
+                except JSONDecodeError:
+                    # torn tail of an interrupted write, everything before it is valid
+                    logging.warning("ignoring incomplete save journal entry")
+                    break
+                if entry.get("generation", 0) != generation:
+                    continue
+                state.update(entry["fields"])
+                state["choices"].update(entry["choices"])
+                for key in entry["deleted"]:
+                    state["choices"].pop(key, None)
+        return state
@@ -0,0 +1,277 @@
+import sys
+import threading
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from json import load, loads, dump, JSONDecodeError
+from ..config import *
+from ..packaging.bundle import NVLBundle, scene_fingerprint
+from ..packaging.vfs import LOCAL_FS, LocalFS, asset_path
+
+INDEX_VERSION = 1
+SCENE_SLOTS = ("id", "text", "person", "background", "music", "script", "advance_after")
+ASSET_FIELDS = ("background", "music", "script")
+
+
+class SceneRecord:
+    # a scene without the per-scene dict: known fields live in slots, speaker names and
+    # asset paths are interned so thousands of scenes share one string each. Reads like
+    # the json dict it came from; a field the file didn't have is None and not "in" it
+    __slots__ = SCENE_SLOTS + ("extra",)
+
+    def __init__(self, id: int, text=None, person=None, background=None, music=None, script=None,
+                 advance_after=None, extra=None) -> None:
+        self.id = id
+        self.text = text
+        self.person = None if person is None else sys.intern(person)
+        self.background = None if background is None else asset_path(background)
+        self.music = None if music is None else asset_path(music)
+        self.script = None if script is None else asset_path(script)
+        self.advance_after = advance_after
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, scene: dict) -> "SceneRecord":
+        extra = {key: value for key, value in scene.items() if key not in SCENE_SLOTS} or None
+        return cls(scene["id"], scene.get("text"), scene.get("person"), scene.get("background"),
+                   scene.get("music"), scene.get("script"), scene.get("advance_after"), extra)
+
+    def __getitem__(self, key: str):
+        if key in SCENE_SLOTS:
+            value = getattr(self, key)
+            if value is not None:
+                return value
+        elif self.extra is not None and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key: str) -> bool:
+        if key in SCENE_SLOTS:
+            return getattr(self, key) is not None
+        return self.extra is not None and key in self.extra
+
+    def keys(self) -> list:
+        keys = [key for key in SCENE_SLOTS if getattr(self, key) is not None]
+        return keys + list(self.extra or ())
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def items(self) -> list:
+        return [(key, self[key]) for key in self.keys()]
+
+    def to_dict(self) -> dict:
+        return dict(self.items())
+
+    def __repr__(self) -> str:
+        return f"SceneRecord({self.to_dict()!r})"
+
+
+class SceneStore:
+    def __init__(self, scene_dir: str, cache_size: int = 256, index_path: str = ".scene-index.json",
+                 bundle_path: str = "scenes.nvlb", fs=LOCAL_FS) -> None:
+        # "scenes" and "./scenes" are one folder; the index records the folder, so spell it one way
+        self.scene_dir = os.path.normpath(scene_dir)
+        self.fs = fs
+        self.bundle_path = bundle_path
+        self.bundle = None
+        self.cache_size = cache_size
+        self.index_path = index_path
+        self.files: dict = {}
+        self.ids: list = []
+        self.positions: dict = {}
+        self.cache: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.dir_mtime = None
+
+    def refresh(self):
+        if self.bundle is not None:
+            self.bundle.close()
+            self.bundle = None
+        self.bundle = self._open_bundle()
+        if self.bundle is not None:
+            logging.info(f"loading scenes from bundle {self.bundle_path}")
+            self._set_ids(self.bundle.ids(), {})
+            return
+        if not self.fs.isdir(self.scene_dir):
+            logging.critical(f"scene dir {self.scene_dir} not found")
+            exit(-1)
+        dir_mtime, _ = self.fs.stat(self.scene_dir)
+        self.dir_mtime = dir_mtime
+        files = self._read_index(dir_mtime)
+        if files is None:
+            logging.info(f"indexing scenes in {self.scene_dir}")
+            files = self._build_index()
+            self._write_index(dir_mtime, files)
+        self._set_ids(sorted(files), files)
+
+    def _set_ids(self, ids: list, files: dict):
+        with self.lock:
+            self.files = files
+            self.ids = ids
+            self.positions = {scene_id: i for i, scene_id in enumerate(ids)}
+            self.cache.clear()
+            self.loaded = True
+        logging.info(f"{len(self.ids)} scenes indexed")
+
+    def _open_bundle(self):
+        if not self.bundle_path or not self.fs.exists(self.bundle_path):
+            return None
+        try:
+            if isinstance(self.fs, LocalFS):
+                bundle = NVLBundle(self.bundle_path)
+            else:
+                # a package is built in one go, its bundle always matches its scenes
+                return NVLBundle(self.bundle_path, self.fs.read(self.bundle_path))
+        except ValueError as e:
+            logging.warning(f"{e}, using loose json scenes")
+            return None
+        if self.fs.isdir(self.scene_dir) and bundle.fingerprint != scene_fingerprint(self.scene_dir):
+            logging.warning(f"{self.bundle_path} does not match the files in {self.scene_dir}, using loose json scenes")
+            bundle.close()
+            return None
+        return bundle
+
+    def _ensure(self):
+        if not self.loaded:
+            self.refresh()
+
+    def _read_index(self, dir_mtime: int):
+        if not self.index_path or not os.path.exists(self.index_path):
+            return None
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = load(f)
+        except (OSError, JSONDecodeError):
+            logging.warning(f"scene index {self.index_path} is broken, rebuilding")
+            return None
+        if (data.get("version") != INDEX_VERSION or data.get("scene_dir") != self.scene_dir
+                or data.get("mtime") != dir_mtime):
+            return None
+        return {int(scene_id): name for scene_id, name in data["scenes"].items()}
+
+    def _write_index(self, dir_mtime: int, files: dict):
+        if not self.index_path:
+            return
+        data = {
+            "version": INDEX_VERSION,
+            "scene_dir": self.scene_dir,
+            "mtime": dir_mtime,
+            "scenes": {str(scene_id): name for scene_id, name in files.items()},
+        }
+        tmp_path = self.index_path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                dump(data, f)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            logging.warning(f"cant persist scene index: {e}")
+
+    def _build_index(self) -> dict:
+        files = {}
+        for name in self.fs.listdir(self.scene_dir):
+            if not name.endswith(".json"):
+                continue
+            stem = name[:-len(".json")]
+            if stem.isdigit():
+                scene_id = int(stem)
+            else:
+                # only files not named by id have to be parsed to learn it
+                scene_id = loads(self.fs.read_text(os.path.join(self.scene_dir, name)))["id"]
+            if scene_id in files:
+                logging.warning(f"scene id {scene_id} is defined twice, using {name}")
+            files[scene_id] = name
+        return files
+
+    def add(self, scene_id: int, name: str):
+        # a scene file was just written: update the index in place instead of rescanning
+        self._ensure()
+        with self.lock:
+            if scene_id not in self.positions:
+                if not self.ids or scene_id > self.ids[-1]:
+                    self.positions[scene_id] = len(self.ids)
+                    self.ids.append(scene_id)
+                else:
+                    insort(self.ids, scene_id)
+                    self.positions = {i: pos for pos, i in enumerate(self.ids)}
+            self.files[scene_id] = name
+            self.cache.pop(scene_id, None)
+        if self.bundle is None:
+            self.dir_mtime, _ = self.fs.stat(self.scene_dir)
+            self._write_index(self.dir_mtime, self.files)
+
+    def stale(self) -> bool:
+        # files added behind the store's back show up as a newer directory mtime
+        return self.bundle is None and self.loaded and self.fs.stat(self.scene_dir)[0] != self.dir_mtime
+
+    def __len__(self) -> int:
+        self._ensure()
+        return len(self.ids)
+
+    def __contains__(self, scene_id) -> bool:
+        self._ensure()
+        return scene_id in self.positions
+
+    def __getitem__(self, scene_id: int) -> SceneRecord:
+        return self.get(scene_id)
+
+    def get(self, scene_id: int) -> SceneRecord:
+        self._ensure()
+        with self.lock:
+            scene = self.cache.get(scene_id)
+            if scene is not None:
+                self.cache.move_to_end(scene_id)
+                return scene
+        if self.bundle is not None:
+            scene = SceneRecord.from_dict(self.bundle.get(scene_id))
+        else:
+            name = self.files[scene_id]
+            scene = SceneRecord.from_dict(loads(self.fs.read_text(os.path.join(self.scene_dir, name))))
+            if scene.id != scene_id:
+                # the index went by the file name; navigation has to agree with it
+                logging.warning(f"{name} says it is scene {scene.id}, using {scene_id} from its file name")
+                scene.id = scene_id
+        with self.lock:
+            self.cache[scene_id] = scene
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return scene
+
+    def first_id(self) -> int:
+        self._ensure()
+        return self.ids[0]
+
+    def last_id(self) -> int:
+        self._ensure()
+        return self.ids[-1]
+
+    def position(self, scene_id: int) -> int:
+        self._ensure()
+        if scene_id in self.positions:
+            return self.positions[scene_id]
+        return bisect_left(self.ids, scene_id)
+
+    def next_id(self, scene_id: int):
+        pos = self.position(scene_id)
+        if scene_id in self.positions:
+            pos += 1
+        return self.ids[pos] if pos < len(self.ids) else None
+
+    def prev_id(self, scene_id: int):
+        pos = self.position(scene_id) - 1
+        return self.ids[pos] if pos >= 0 else None
+
+    def clamp(self, scene_id: int) -> int:
+        self._ensure()
+        if scene_id in self.positions:
+            return scene_id
+        if scene_id < self.ids[0]:
+            return self.ids[0]
+        next_id = self.next_id(scene_id)
+        return self.ids[-1] if next_id is None else next_id
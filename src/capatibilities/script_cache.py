@@ -0,0 +1,236 @@
+import time
+from ..config import *
+from ..packaging.vfs import LOCAL_FS
+
+BUDGET_ERROR = "script budget exceeded"
+# instructions between count hooks: coarse while only guarding, finer while profiling
+BUDGET_STEP = 1000
+PROFILE_STEP = 100
+
+# Installed with debug.sethook around a script call. The count hook enforces the
+# instruction and time budget; with profiling on, call/return hooks time every Lua
+# function (inclusive) and count hooks charge instructions to the innermost one.
+# The clock is time.perf_counter: os.clock is CPU time of the whole process, so
+# audio and prefetch threads would eat into a script's budget. While a hook is
+# installed pcall/xpcall pass a budget abort on, a script can't swallow it.
+HOOK_LUA = """
+local BUDGET_ERROR, clock = ...
+local sethook, getinfo = debug.sethook, debug.getinfo
+local G, raw_pcall, raw_xpcall = _G, pcall, xpcall
+local functions = {}
+local stack, depth = {}, 0
+local count, start, step, max_count, max_time, profile = 0, 0, 0, 0, 0, false
+local exceeded = false
+
+local function rethrow(ok, ...)
+    if not ok and exceeded then
+        error(BUDGET_ERROR, 0)
+    end
+    return ok, ...
+end
+
+local function guarded_pcall(f, ...)
+    return rethrow(raw_pcall(f, ...))
+end
+
+local function guarded_xpcall(f, handler, ...)
+    return rethrow(raw_xpcall(f, handler, ...))
+end
+
+local function leave(now)
+    local frame = stack[depth]
+    if frame == nil then
+        return
+    end
+    stack[depth] = nil
+    depth = depth - 1
+    if frame[1] then
+        local stats = functions[frame[1]]
+        stats[2] = stats[2] + (now - frame[2])
+    end
+end
+
+local function hook(event)
+    if event == "count" then
+        count = count + step
+        if profile then
+            for i = depth, 1, -1 do
+                local key = stack[i][1]
+                if key then
+                    local stats = functions[key]
+                    stats[3] = stats[3] + step
+                    break
+                end
+            end
+        end
+        if exceeded or (max_count > 0 and count > max_count) or (max_time > 0 and clock() - start > max_time) then
+            exceeded = true
+            error(BUDGET_ERROR, 0)
+        end
+        return
+    end
+    local now = clock()
+    if event ~= "call" then
+        leave(now)
+        if event == "return" then
+            return
+        end
+    end
+    local info = getinfo(2, "S")
+    local key = nil
+    if info.what ~= "C" and info.source ~= "=hooks" and info.source ~= "=bridge" then
+        key = info.short_src .. ":" .. info.linedefined
+        local stats = functions[key]
+        if stats == nil then
+            stats = {0, 0, 0}
+            functions[key] = stats
+        end
+        stats[1] = stats[1] + 1
+    end
+    depth = depth + 1
+    stack[depth] = {key, now}
+end
+
+local function start_hook(hook_step, instructions, seconds, profiling)
+    count, start, step, max_count, max_time, profile = 0, clock(), hook_step, instructions, seconds, profiling
+    stack, depth, exceeded = {}, 0, false
+    G.pcall, G.xpcall = guarded_pcall, guarded_xpcall
+    sethook(hook, profiling and "cr" or "", hook_step)
+end
+
+local function stop_hook()
+    sethook()
+    G.pcall, G.xpcall = raw_pcall, raw_xpcall
+    -- functions cut short by a budget abort never returned, they end here
+    local now = clock()
+    while depth > 0 do
+        leave(now)
+    end
+    return count, exceeded
+end
+
+return start_hook, stop_hook, functions
+"""
+
+
+class ScriptBudgetExceeded(Exception):
+    pass
+
+
+class ScriptStats:
+    __slots__ = ("compiles", "compile_time", "runs", "exec_time", "instructions", "aborted")
+
+    def __init__(self) -> None:
+        self.compiles = 0
+        self.compile_time = 0.0
+        self.runs = 0
+        self.exec_time = 0.0
+        self.instructions = 0
+        self.aborted = 0
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class ScriptCache:
+    def __init__(self, lua, fs=LOCAL_FS, profile: bool = False) -> None:
+        self.lua = lua
+        self.fs = fs
+        self.profile = profile
+        self.chunks: dict = {}
+        self.stats: dict = {}
+        self.start_hook, self.stop_hook, self.functions = lua.compile(HOOK_LUA, name="=hooks")(BUDGET_ERROR, time.perf_counter)
+        self.guarding = False
+
+    def _stats(self, path: str) -> ScriptStats:
+        stats = self.stats.get(path)
+        if stats is None:
+            stats = self.stats[path] = ScriptStats()
+        return stats
+
+    def compile(self, path: str):
+        mtime, _ = self.fs.stat(path)
+        cached = self.chunks.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        lua_code = self.fs.read_text(path)
+        start = time.perf_counter()
+        chunk = self.lua.compile(lua_code, name=f"@{path}")
+        stats = self._stats(path)
+        stats.compiles += 1
+        stats.compile_time += time.perf_counter() - start
+        self.chunks[path] = (mtime, chunk)
+        logging.debug("compiled %s in %.6fs total", path, stats.compile_time)
+        return chunk
+
+    def run(self, path: str, instructions: int = 0, seconds: float = 0.0):
+        return self.call(path, self.compile(path), instructions=instructions, seconds=seconds)
+
+    def call(self, path: str, fn, *args, instructions: int = 0, seconds: float = 0.0):
+        # without a budget or the profiler the call runs with no hook at all; a call made
+        # from inside a guarded one is already covered by the outer hook
+        stats = self._stats(path)
+        guarded = (instructions > 0 or seconds > 0 or self.profile) and not self.guarding
+        if guarded:
+            self.guarding = True
+            self.start_hook(PROFILE_STEP if self.profile else BUDGET_STEP, instructions, seconds, self.profile)
+        result, aborted, exceeded = None, False, False
+        start = time.perf_counter()
+        try:
+            result = fn(*args)
+        except Exception as e:
+            if not guarded or BUDGET_ERROR not in str(e):
+                raise
+            aborted = True
+        finally:
+            elapsed = time.perf_counter() - start
+            if guarded:
+                instructions_run, exceeded = self.stop_hook()
+                stats.instructions += instructions_run
+                self.guarding = False
+            stats.runs += 1
+            stats.exec_time += elapsed
+        # the hook remembers a budget abort even when the script caught the error and returned
+        if not (aborted or exceeded):
+            return result
+        stats.aborted += 1
+        limits = [f"{instructions} instructions"] if instructions > 0 else []
+        if seconds > 0:
+            limits.append(f"{seconds * 1000:.0f} ms")
+        raise ScriptBudgetExceeded(
+            f"{path} was stopped after {elapsed * 1000:.1f} ms, over its budget of {' / '.join(limits)}"
+        )
+
+    def precompile(self, paths) -> list:
+        errors = []
+        for path in dict.fromkeys(paths):
+            if not self.fs.exists(path):
+                errors.append((path, "file not found"))
+                continue
+            try:
+                self.compile(path)
+            except Exception as e:
+                errors.append((path, str(e)))
+        return errors
+
+    def get_stats(self) -> dict:
+        return {path: stats.as_dict() for path, stats in self.stats.items()}
+
+    def function_stats(self) -> dict:
+        return {key: {"calls": int(stats[1]), "time": stats[2], "instructions": int(stats[3])}
+                for key, stats in self.functions.items()}
+
+    def format_profile(self, limit: int = 20) -> str:
+        lines = [f"{'script':<36}{'runs':>7}{'total ms':>11}{'instructions':>14}{'aborted':>9}"]
+        scripts = sorted(self.stats.items(), key=lambda item: -item[1].exec_time)
+        for path, stats in scripts[:limit]:
+            lines.append(f"{path:<36}{stats.runs:>7}{stats.exec_time * 1000:>11.2f}"
+                         f"{stats.instructions:>14}{stats.aborted:>9}")
+        functions = self.function_stats()
+        if functions:
+            lines.append("")
+            lines.append(f"{'function':<36}{'calls':>7}{'total ms':>11}{'instructions':>14}")
+            for key in sorted(functions, key=lambda k: -functions[k]["time"])[:limit]:
+                row = functions[key]
+                lines.append(f"{key:<36}{row['calls']:>7}{row['time'] * 1000:>11.2f}{row['instructions']:>14}")
+        return "\n".join(lines)
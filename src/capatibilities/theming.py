@@ -1,16 +1,16 @@
-from json import load, dump, JSONDecodeError
-import os
+from json import loads
 from ..config import *
+from ..packaging.vfs import LOCAL_FS
 
 
 class ThemeManager:
-    def __init__(self) -> None:
+    def __init__(self, fs=LOCAL_FS) -> None:
         self.theme: dict = {}
+        self.fs = fs
 
     def load_theme(self, theme):
-        if os.path.exists(theme):
-            with open(theme, "r", encoding="utf-8") as f:
-                self.theme = load(f)
+        if self.fs.exists(theme):
+            self.theme = loads(self.fs.read_text(theme))
         else:
             logging.warning(f"theme {theme} not found")
 
@@ -0,0 +1,109 @@
+import threading
+import time
+from collections import deque
+from json import dumps
+from ..config import *
+
+
+class NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    __slots__ = ("events", "name", "start")
+
+    def __init__(self, events: deque, name: str) -> None:
+        self.events = events
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        # deque.append is atomic, prefetch workers record into the same ring
+        self.events.append((self.name, self.start, end - self.start, threading.get_ident()))
+        return False
+
+
+class Tracer:
+    def __init__(self) -> None:
+        self.enabled = False
+        self.path = ""
+        self.events: deque = deque(maxlen=100000)
+
+    def configure(self, enabled: bool, capacity: int = 100000, path: str = "") -> None:
+        self.enabled = enabled
+        self.path = path
+        self.events = deque(self.events, maxlen=max(capacity, 1))
+
+    def span(self, name: str):
+        # disabled tracing costs one attribute check and returns a shared no-op
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self.events, name)
+
+    def clear(self) -> None:
+        self.events.clear()
+
+    def summary(self) -> dict:
+        durations = {}
+        for name, _, duration, _ in list(self.events):
+            durations.setdefault(name, []).append(duration)
+        result = {}
+        for name, values in durations.items():
+            values.sort()
+            result[name] = {
+                "count": len(values),
+                "total_ms": sum(values) / 1e6,
+                "p50_ms": values[len(values) // 2] / 1e6,
+                "p99_ms": values[min(len(values) - 1, len(values) * 99 // 100)] / 1e6,
+                "max_ms": values[-1] / 1e6,
+            }
+        return result
+
+    def format_summary(self) -> str:
+        lines = [f"{'span':<14}{'count':>8}{'total ms':>11}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}"]
+        summary = self.summary()
+        for name in sorted(summary, key=lambda n: -summary[n]["total_ms"]):
+            row = summary[name]
+            lines.append(
+                f"{name:<14}{row['count']:>8}{row['total_ms']:>11.2f}{row['p50_ms']:>9.3f}"
+                f"{row['p99_ms']:>9.3f}{row['max_ms']:>9.3f}"
+            )
+        return "\n".join(lines)
+
+    def chrome_trace(self) -> dict:
+        pid = os.getpid()
+        events = [
+            {"name": name, "ph": "X", "ts": start / 1000, "dur": duration / 1000, "pid": pid, "tid": tid}
+            for name, start, duration, tid in list(self.events)
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome(self, path: str) -> None:
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(dumps(self.chrome_trace()))
+        os.replace(tmp, path)
+
+    def close(self) -> None:
+        if not self.enabled or not self.events:
+            return
+        logging.info("trace summary:\n%s", self.format_summary())
+        if self.path:
+            self.write_chrome(self.path)
+            logging.info("trace written to %s", self.path)
+
+
+TRACER = Tracer()
@@ -1,14 +1,20 @@
 import logging
-import numpy as np
 import os
+from .lazy import lazy_import
 
-if os.path.exists("app.log"):
-    os.system("rm app.log")
+# heavy modules are imported on first use, a text-only novel never pays for them
+np = lazy_import("numpy")
+cv2 = lazy_import("cv2", setup=lambda module: module.ocl.setUseOpenCL(True))
+rich_console = lazy_import("rich.console")
 
+# every session starts a fresh log; the file is truncated when the first record is written
 logging.basicConfig(
-    filename='app.log',            
-    level=logging.DEBUG,          
+    handlers=[logging.FileHandler("app.log", mode="w", encoding="utf-8", delay=True)],
+    level=logging.DEBUG,
     format='[%(asctime)s] - [%(levelname)s] > %(message)s'
 )
 
-SYMBOLS = np.array(list("▒▓▓█"))
\ No newline at end of file
+SYMBOLS = "▒▓▓█"
+RENDER_MODES = ("rich", "ansi", "halfblock")
+HALF_BLOCK = "▀"
+AUDIO_BACKENDS = ("pygame", "null")
@@ -0,0 +1,40 @@
+import importlib
+import threading
+import types
+
+
+class LazyModule(types.ModuleType):
+    # stands in for a heavy module and imports it on first attribute access
+    def __init__(self, name: str, setup=None) -> None:
+        super().__init__(name)
+        self.__dict__["_lazy_setup"] = setup
+        self.__dict__["_lazy_module"] = None
+        self.__dict__["_lazy_lock"] = threading.Lock()
+
+    def _load(self):
+        module = self.__dict__["_lazy_module"]
+        if module is not None:
+            return module
+        with self.__dict__["_lazy_lock"]:
+            module = self.__dict__["_lazy_module"]
+            if module is None:
+                module = importlib.import_module(self.__name__)
+                setup = self.__dict__["_lazy_setup"]
+                if setup is not None:
+                    setup(module)
+                self.__dict__["_lazy_module"] = module
+        return module
+
+    @property
+    def loaded(self) -> bool:
+        return self.__dict__["_lazy_module"] is not None
+
+    def __getattr__(self, name: str):
+        return getattr(self._load(), name)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_import(name: str, setup=None) -> LazyModule:
+    return LazyModule(name, setup)
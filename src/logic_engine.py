@@ -1,22 +1,35 @@
 from .render_engine import *
+from .capatibilities.events import *
 from getpass import getpass
+import asyncio
+import sys
 
 class LogicEngine(RenderEngine, MusicManager):
-    def __init__(self):
-        super().__init__()
-        self.lua.globals().engine = self # type: ignore
+    def __init__(self, fs=LOCAL_FS):
+        super().__init__(fs)
         self.await_input = True
+        self.read_input = getpass
+
+    def start_lua(self):
+        super().start_lua()
+        self.lua.globals().engine = self # type: ignore
+        self.lua_bridge = LuaBridge(self.lua, self, cv2)
 
     def add_choice(self, name: str, choice: str):
-        logging.debug(f"adding choice: {name}={choice}")
+        logging.debug("adding choice: %s=%s", name, choice)
         self.choices[name] = choice
 
     def get_choice(self, name: str):
-        logging.debug(f"getting {name} choice")
+        logging.debug("getting %s choice", name)
         if name not in self.choices:
             return None
         return self.choices[name]
     
+    def set_choices(self, choices):
+        if self.lua_started and self.lua_type(choices) == "table":
+            choices = dict(choices.items())
+        self.choices = ChoiceMap(choices or {})
+
     def delete_choice(self, name: str):
         logging.debug("deleting {name} choice")
         if name not in self.choices:
@@ -24,42 +37,70 @@ class LogicEngine(RenderEngine, MusicManager):
             exit(-1)
         del self.choices[name]
 
-    def load_scene(self, scene: dict, execute=True):
+    def as_scene(self, scene) -> SceneRecord:
+        # scripts hand over plain Lua tables, which have no .get
+        if isinstance(scene, SceneRecord):
+            return scene
+        if self.lua_started and self.lua_type(scene) == "table":
+            scene = dict(scene.items())
+        return SceneRecord.from_dict(scene)
+
+    def load_scene(self, scene: SceneRecord, execute=True):
+        scene = self.as_scene(scene)
         self.id = scene["id"]
         self.text = scene["text"]
         self.background = scene["background"]
         self.person = scene["person"]
+        self.advance_after = scene.get("advance_after", 0)
+        self.script_budget = (
+            scene.get("script_budget_instructions", self.parser.get_script_budget_instructions()),
+            scene.get("script_budget_ms", self.parser.get_script_budget_ms()) / 1000,
+        )
         if "music" in scene:
             self.music = scene["music"]
-            logging.info(f"playing music {scene['music']}")
+            logging.info("playing music %s", scene["music"])
             self.play_audio(self.music)
-        if "script" in scene and os.path.exists(scene["script"]) and execute:
-            logging.debug(f"founded script {scene['script']}")
-            with open(scene["script"], "r", encoding="utf-8") as f:
-                lua_code = f.read()
-            logging.info(f"executing {scene['script']}")
-            self.lua.execute(lua_code)
-        elif "script" in scene and not os.path.exists(scene['script']):
+        if "script" in scene and self.fs.exists(scene["script"]) and execute:
+            logging.debug("founded script %s", scene["script"])
+            logging.info("executing %s", scene["script"])
+            # hooks the script defines are charged to it until another script replaces them
+            self.script_path = scene["script"]
+            instructions, seconds = self.script_budget
+            try:
+                self.scripts.run(self.script_path, instructions, seconds)
+            except ScriptBudgetExceeded as e:
+                logging.error(f"{e}, scene {self.id} goes on without it")
+        elif "script" in scene and not self.fs.exists(scene['script']):
             logging.warning(f"script {scene['script']} entry founded in scene file, but file dont found")
     
-    def default_scene(self, scene: dict):
+    def default_scene(self, scene: SceneRecord):
+        scene = self.as_scene(scene)
         self.id = scene["id"]
         self.text = scene["text"]
         self.background = scene["background"]
         self.person = scene["person"]
+        self.advance_after = scene.get("advance_after", 0)
         if "musin" in scene:
             self.music = scene["music"]
 
     def register_scenes(self):
-        self.scenes = []
-        for i in os.listdir("scenes"):
-            if i.endswith(".json"):
-                with open(os.path.join("scenes", i), "r", encoding="utf-8") as f:
-                    self.scenes.append(load(f))
-        self.scenes.sort(key=lambda x: x["id"])
-        self.default_scene(self.scenes[self.id - 1])
+        self.scenes.refresh()
+        self.id = self.scenes.clamp(self.id)
+        self.default_scene(self.scenes.get(self.id))
+        if self.parser.get_precompile_scripts():
+            self.precompile_scripts()
         return self.scenes
 
+    def precompile_scripts(self):
+        paths = []
+        for scene_id in self.scenes.ids:
+            scene = self.scenes.get(scene_id)
+            if "script" in scene:
+                paths.append(scene["script"])
+        for path, error in self.scripts.precompile(paths):
+            logging.warning(f"cant precompile {path}: {error}")
+        logging.info(f"precompiled {len(self.scripts.chunks)} scripts")
+
     def get_scene(self):
         return {
             "id": self.id,
@@ -70,50 +111,119 @@ class LogicEngine(RenderEngine, MusicManager):
             "music": self.music,
         }
 
+    def prefetch_scene(self, scene: SceneRecord, w: int, h: int, tab_key: tuple, tab: tuple) -> PrefetchedScene:
+        item = PrefetchedScene(scene["id"])
+        item.background = scene["background"]
+        item.tab_key, item.tab = tab_key, tab
+        if self.fs.exists(item.background):
+            item.frame_key = self.frame_key(item.background, w, h, tab[1])
+            item.frame = self.cached_frame(item.frame_key, item.background, w, h, tab[1])
+        if "music" in scene:
+            item.music = scene["music"]
+            self.preload_audio(item.music)
+        return item
+
+    def prefetch_next(self):
+        next_id = self.scenes.next_id(self.id)
+        if not self.prefetcher.enabled or next_id is None:
+            return
+        logging.debug("prefetching scene %s", next_id)
+        scene = self.scenes.get(next_id)
+        # laying out the panel is cheap and cached, doing it here hands the worker the
+        # real tab height so the background encode never waits on the text
+        tab_key = (next_id, scene["text"], scene["person"], self.w)
+        with self.tracer.span("tab"):
+            tab = self.build_tab(*tab_key)
+        self.prefetcher.submit(next_id, self.prefetch_scene, scene, self.w, self.h, tab_key, tab)
+
+    def invalidate_prefetch(self):
+        self.prefetcher.invalidate()
+        self.prefetched = None
+
     def next_scene(self):
         logging.info("loading next scene")
-        if self.id < len(self.scenes):
-            self.id += 1
-            self.load_scene(self.scenes[self.id - 1])
+        next_id = self.scenes.next_id(self.id)
+        if next_id is not None:
+            self.id = next_id
+            self.prefetched = self.prefetcher.take(self.id)
+            with self.tracer.span("load_scene"):
+                self.load_scene(self.scenes.get(self.id))
             self.apply_lua_logic()
         else:
             self.exit()
 
+    def remember(self):
+        frame_key = self.shown_frame_key if self.fs.exists(self.background) else None
+        self.history.push(Snapshot(
+            self.id, self.text, self.person, self.background, self.music, self.show_tab,
+            self.advance_after, self.choices.freeze(), frame_key,
+        ))
+
+    def rewind(self, steps: int = 1) -> bool:
+        snapshot = self.history.rewind(steps)
+        if snapshot is None:
+            return False
+        logging.info("rewinding %s scenes to %s", steps, snapshot.id)
+        self.invalidate_prefetch()
+        self.id, self.text, self.person, self.background = snapshot[:4]
+        self.show_tab, self.advance_after = snapshot.show_tab, snapshot.advance_after
+        # the snapshot's choices become the live map, copied only once something writes
+        self.choices = ChoiceMap.thaw(snapshot.choices)
+        if snapshot.music != self.music:
+            if snapshot.music:
+                self.play_audio(snapshot.music)
+            else:
+                self.stop_audio()
+            self.music = snapshot.music
+        # the remembered frame is fetched again and handed to the renderer the way a
+        # prefetched one is, unless the terminal or the background changed since
+        item = PrefetchedScene(snapshot.id)
+        item.background = snapshot.background
+        key = snapshot.frame_key
+        if key is not None and key == self.frame_key(snapshot.background, self.w, self.h, key[5]):
+            item.frame_key, item.frame = key, self.cached_frame(key, snapshot.background, self.w, self.h, key[5])
+        self.prefetched = item
+        return True
+
     def prev_scene(self):
         logging.info("loading previous scene")
-        self.id -= 1
-        if self.id < 1:
-            self.id = 1
-        self.load_scene(self.scenes[self.id - 1])
+        if self.rewind(1):
+            return
+        self.invalidate_prefetch()
+        prev_id = self.scenes.prev_id(self.id)
+        if prev_id is not None:
+            self.id = prev_id
+        self.load_scene(self.scenes.get(self.id))
         self.apply_lua_logic()
 
     def custom_scene(self, id: int):
         logging.info("loading custom scene")
-        self.id = id
-        if self.id < 1:
-            self.id = 1
-        elif self.id > len(self.scenes):
-            self.id = len(self.scenes)
-        self.load_scene(self.scenes[self.id - 1])
+        steps = self.history.steps_to(id)
+        if steps and self.rewind(steps):
+            return
+        self.invalidate_prefetch()
+        self.id = self.scenes.clamp(id)
+        self.load_scene(self.scenes.get(self.id))
 
     def apply_lua_logic(self, lua_function_name="modify_scene"):
-        logging.debug(f"applying lua logic on id {self.id}")
+        if not self.lua_started:
+            # no script has run yet, so there is nothing to call
+            return
+        logging.debug("applying lua logic on id %s", self.id)
         if lua_function_name in self.lua_env: # type: ignore
-            scene_data = {
-                "id": self.id,
-                "text": self.text,
-                "background": self.background,
-                "person": self.person,
-                "get_choice": self.get_choice,
-                "delete_choice": self.delete_choice,
-                "add_choice": self.add_choice,
-                "cv": cv2,
-                "music": self.music,
-            }
-
             lua_function = self.lua_env[lua_function_name] # type: ignore
+            self.show_tab = True
             try:
-                new_scene = lua_function(scene_data)
+                instructions, seconds = self.script_budget
+                with self.tracer.span(lua_function_name):
+                    new_scene = self.scripts.call(
+                        self.script_path or lua_function_name, self.lua_bridge.apply, lua_function,
+                        instructions=instructions, seconds=seconds,
+                    )
+            except ScriptBudgetExceeded as e:
+                # a runaway hook stops the script, not the novel
+                logging.error(f"{e} in {lua_function_name}, scene {self.id} goes on without it")
+                new_scene = None
             except Exception as e:
                 logging.critical(f"Error in lua function: {e}")
                 exit(-1)
@@ -121,8 +231,19 @@ class LogicEngine(RenderEngine, MusicManager):
                 self.text = new_scene.get("text", self.text)
                 self.person = new_scene.get("person", self.person)
                 self.background = new_scene.get("background", self.background)
-                self.choices = new_scene.get("choices", self.choices)
+                self.set_choices(new_scene.get("choices", self.choices))
                 self.show_tab = new_scene.get("show_tab", True)
+            # scripts write engine.background straight through the bridge, in any spelling
+            self.background = asset_path(self.background or "")
+
+            prefetched = self.prefetched
+            if prefetched is not None and prefetched.id == self.id:
+                if prefetched.background != self.background:
+                    logging.debug("lua changed background of scene %s, dropping prefetched frame", self.id)
+                    prefetched.frame_key = prefetched.frame = None
+                if prefetched.tab_key is not None and prefetched.tab_key[1:3] != (self.text, self.person):
+                    logging.debug("lua changed text of scene %s, dropping prefetched tab", self.id)
+                    prefetched.tab_key = prefetched.tab = None
 
             if lua_function_name == "post_scene":
                 logging.debug("executing post scene script")
@@ -138,31 +259,78 @@ class LogicEngine(RenderEngine, MusicManager):
             "background": self.background,
             "person": self.person,
             "music": self.music,
-            "choices": self.choices,
         }
-
-        with open(self.save_dir, "w", encoding="utf-8") as f:
-            dump(save_data, f, indent=4)
+        with self.tracer.span("save"):
+            self.saves.save(save_data, self.choices)
 
     def load_game(self):
         logging.info("loading save")
         try:
-            with open(self.save_dir, "r", encoding="utf-8") as f:
-                save_data = load(f)
+            save_data = self.saves.load()
 
             self.id = save_data["id"]
             self.text = save_data["text"]
             self.background = save_data["background"]
             self.person = save_data["person"]
-            self.choices = save_data["choices"]
+            self.set_choices(save_data["choices"])
 
-            self.load_scene(self.scenes[self.id - 1])
+            self.invalidate_prefetch()
+            self.load_scene(self.scenes.get(self.id))
 
-        except (FileNotFoundError, JSONDecodeError) as e:
+        except (FileNotFoundError, JSONDecodeError, KeyError):
             logging.critical("error while loading save")
-            self.choices = {}
+            self.choices = ChoiceMap()
+
+    def relayout(self):
+        size = self.console.size
+        if tuple(size) == (self.w, self.h):
+            return
+        logging.info("terminal resized to %sx%s", *size)
+        self.w, self.h = size
+        # only the current frame is re-encoded, the scene and its scripts stay as they are
+        self.invalidate_prefetch()
+        self.framebuffer.reset()
+        self.render(self.show_tab)
+        self.remember()
+        self.prefetch_next()
+
+    async def wait_advance(self) -> bool:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.advance_after if self.advance_after else None
+        while True:
+            self.events.want_input()
+            timeout = None if deadline is None else max(deadline - loop.time(), 0)
+            try:
+                event = await asyncio.wait_for(self.event_queue.get(), timeout)
+            except asyncio.TimeoutError:
+                logging.debug("auto advancing scene %s", self.id)
+                return True
+            if event == ADVANCE:
+                return True
+            if event == QUIT:
+                return False
+            if event == BACK and self.rewind(1):
+                # a scene the player goes back to waits for input, it does not auto advance
+                deadline = None
+                self.save_game()
+                self.render(self.show_tab)
+                self.remember()
+                self.prefetch_next()
+            if event == RESIZE:
+                await self.events.settle_resize()
+                self.relayout()
+
+    async def wait_prefetch(self):
+        # let input and resize events through while the next scene is still being prepared
+        next_id = self.scenes.next_id(self.id)
+        future = None if next_id is None else self.prefetcher.future(next_id)
+        if future is not None and not future.done():
+            await asyncio.wait([asyncio.wrap_future(future)])
 
     def run(self, register: bool = True, load_save: bool = True):
+        asyncio.run(self.run_async(register, load_save))
+
+    async def run_async(self, register: bool = True, load_save: bool = True):
         logging.info("running game")
         if register:
             self.register_scenes()
@@ -170,15 +338,35 @@ class LogicEngine(RenderEngine, MusicManager):
             if os.path.exists(self.save_dir):
                 self.load_game()
         logging.info("entering game loop")
-        for _ in range(len(self.scenes) - (self.id - 1)):
-            self.save_game()
-            self.apply_lua_logic()
-            self.render(self.show_tab)
-            self.apply_lua_logic(lua_function_name="post_scene")
+        self.event_queue = asyncio.Queue()
+        # the terminal is read key by key unless input was replaced or stdin is not a terminal
+        keyboard = self.read_input is getpass and sys.stdin.isatty()
+        self.events = EventSource(self.read_input, keyboard, lambda: tuple(self.console.size))
+        self.events.start(asyncio.get_running_loop(), self.event_queue)
+        try:
+            while True:
+                self.save_game()
+                self.apply_lua_logic()
+                self.render(self.show_tab)
+                self.remember()
+                self.apply_lua_logic(lua_function_name="post_scene")
+                self.prefetch_next()
 
-            if self.await_input:
-                getpass(prompt="")
-            else:
-                self.await_input = True
+                if self.await_input:
+                    with self.tracer.span("input"):
+                        advance = await self.wait_advance()
+                    if not advance:
+                        self.exit()
+                        return
+                else:
+                    # the script talked to the terminal itself, next frame must be a full repaint
+                    self.framebuffer.reset()
+                    self.await_input = True
 
-            self.next_scene()
+                await self.wait_prefetch()
+                if self.scenes.next_id(self.id) is None:
+                    self.exit()
+                    return
+                self.next_scene()
+        finally:
+            self.events.stop()
@@ -0,0 +1,166 @@
+from ..config import *
+from json import load, dumps, loads
+import mmap
+import struct
+
+BUNDLE_MAGIC = b"NVLB"
+BUNDLE_VERSION = 2
+# magic, version, reserved, scene count, string count, string table offset, records offset,
+# then the fingerprint of the source folder: json file count, newest mtime_ns, total size
+HEADER = struct.Struct("<4sHHIIQQIqQ")
+SCENE_ENTRY = [("id", "<u4"), ("offset", "<u4"), ("length", "<u4")]
+STRING_ENTRY = [("offset", "<u4"), ("length", "<u4")]
+# key string index, value type, 8 value bytes
+FIELD = struct.Struct("<IB8s")
+FIELD_COUNT = struct.Struct("<I")
+
+T_STR, T_INT, T_FLOAT, T_BOOL, T_NULL, T_JSON = range(6)
+
+
+def scene_fingerprint(scene_dir: str) -> tuple:
+    # editing a scene in place leaves the folder mtime alone, so the files themselves are compared
+    count = newest = total = 0
+    with os.scandir(scene_dir) as entries:
+        for entry in entries:
+            if entry.name.endswith(".json") and entry.is_file():
+                stat = entry.stat()
+                count += 1
+                newest = max(newest, stat.st_mtime_ns)
+                total += stat.st_size
+    return count, newest, total
+
+
+class NVLBundleBuilder:
+    def __init__(self, scene_dir: str) -> None:
+        self.scene_dir = scene_dir
+        self.strings: list = []
+        self.string_ids: dict = {}
+
+    def intern(self, value: str) -> int:
+        idx = self.string_ids.get(value)
+        if idx is None:
+            idx = self.string_ids[value] = len(self.strings)
+            self.strings.append(value)
+        return idx
+
+    def encode_field(self, key: str, value) -> bytes:
+        key_idx = self.intern(key)
+        if isinstance(value, bool):
+            return FIELD.pack(key_idx, T_BOOL, struct.pack("<q", int(value)))
+        if isinstance(value, int):
+            return FIELD.pack(key_idx, T_INT, struct.pack("<q", value))
+        if isinstance(value, float):
+            return FIELD.pack(key_idx, T_FLOAT, struct.pack("<d", value))
+        if value is None:
+            return FIELD.pack(key_idx, T_NULL, bytes(8))
+        if isinstance(value, str):
+            return FIELD.pack(key_idx, T_STR, struct.pack("<q", self.intern(value)))
+        return FIELD.pack(key_idx, T_JSON, struct.pack("<q", self.intern(dumps(value, ensure_ascii=False))))
+
+    def load_scenes(self) -> list:
+        scenes = []
+        for name in os.listdir(self.scene_dir):
+            if name.endswith(".json"):
+                with open(os.path.join(self.scene_dir, name), "r", encoding="utf-8") as f:
+                    scenes.append(load(f))
+        scenes.sort(key=lambda x: x["id"])
+        return scenes
+
+    def build(self, out_name: str = "scenes.nvlb") -> int:
+        fingerprint = scene_fingerprint(self.scene_dir)
+        scenes = self.load_scenes()
+        records = []
+        for scene in scenes:
+            fields = [self.encode_field(k, v) for k, v in scene.items()]
+            records.append(FIELD_COUNT.pack(len(fields)) + b"".join(fields))
+
+        encoded = [s.encode("utf-8") for s in self.strings]
+        scene_table = np.zeros(len(scenes), dtype=SCENE_ENTRY)
+        string_table = np.zeros(len(encoded), dtype=STRING_ENTRY)
+
+        strings_offset = HEADER.size + scene_table.nbytes
+        data_offset = strings_offset + string_table.nbytes
+        position = data_offset
+        for i, data in enumerate(encoded):
+            string_table[i] = (position, len(data))
+            position += len(data)
+        records_offset = position
+        for i, (scene, record) in enumerate(zip(scenes, records)):
+            scene_table[i] = (scene["id"], position, len(record))
+            position += len(record)
+
+        tmp_name = out_name + ".tmp"
+        with open(tmp_name, "wb") as f:
+            f.write(HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, 0, len(scenes), len(encoded),
+                                strings_offset, records_offset, *fingerprint))
+            f.write(scene_table.tobytes())
+            f.write(string_table.tobytes())
+            f.writelines(encoded)
+            f.writelines(records)
+        os.replace(tmp_name, out_name)
+        logging.info(f"compiled {len(scenes)} scenes and {len(encoded)} strings into {out_name}")
+        return len(scenes)
+
+
+class NVLBundle:
+    def __init__(self, path: str, buffer=None) -> None:
+        self.path = path
+        self.mm = None
+        if buffer is None:
+            with open(path, "rb") as f:
+                self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            buffer = self.mm
+        buffer = self.buffer = memoryview(buffer)
+        magic, version = struct.unpack_from("<4sH", buffer, 0)
+        if magic != BUNDLE_MAGIC or version != BUNDLE_VERSION:
+            raise ValueError(f"{self.path} is not a v{BUNDLE_VERSION} scene bundle")
+        _, _, _, scene_count, string_count, strings_offset, _, *fingerprint = HEADER.unpack_from(buffer, 0)
+        self.fingerprint = tuple(fingerprint)
+        # both tables are views into the mapping, nothing is copied
+        self.scene_table = np.frombuffer(buffer, dtype=SCENE_ENTRY, count=scene_count, offset=HEADER.size)
+        self.string_table = np.frombuffer(buffer, dtype=STRING_ENTRY, count=string_count, offset=strings_offset)
+        self.strings: dict = {}
+
+    def ids(self) -> list:
+        return self.scene_table["id"].tolist()
+
+    def string(self, idx: int) -> str:
+        value = self.strings.get(idx)
+        if value is None:
+            offset, length = self.string_table[idx]
+            value = self.strings[idx] = str(self.buffer[offset:offset + length], "utf-8")
+        return value
+
+    def find(self, scene_id: int) -> int:
+        pos = int(np.searchsorted(self.scene_table["id"], scene_id))
+        if pos >= len(self.scene_table) or self.scene_table["id"][pos] != scene_id:
+            raise KeyError(scene_id)
+        return pos
+
+    def get(self, scene_id: int) -> dict:
+        _, offset, _ = self.scene_table[self.find(scene_id)]
+        offset = int(offset)
+        (count,) = FIELD_COUNT.unpack_from(self.buffer, offset)
+        start = offset + FIELD_COUNT.size
+        scene = {}
+        for key_idx, kind, raw in FIELD.iter_unpack(self.buffer[start:start + count * FIELD.size]):
+            if kind == T_STR:
+                value = self.string(struct.unpack("<q", raw)[0])
+            elif kind == T_INT:
+                value = struct.unpack("<q", raw)[0]
+            elif kind == T_FLOAT:
+                value = struct.unpack("<d", raw)[0]
+            elif kind == T_BOOL:
+                value = bool(struct.unpack("<q", raw)[0])
+            elif kind == T_JSON:
+                value = loads(self.string(struct.unpack("<q", raw)[0]))
+            else:
+                value = None
+            scene[self.string(key_idx)] = value
+        return scene
+
+    def close(self):
+        self.scene_table = self.string_table = None
+        self.buffer.release()
+        if self.mm is not None:
+            self.mm.close()
@@ -0,0 +1,123 @@
+from __future__ import annotations
+from functools import lru_cache
+from ..config import *
+from .vfs import LOCAL_FS, normalize
+from json import dumps, loads
+import hashlib
+import io
+
+BUILD_DIR = ".tnf-build"
+GRID_DIR = ".grids"
+GRID_INDEX = GRID_DIR + "/index.json"
+# common terminal sizes; grids are stored for the image area above a one-line text panel
+GRID_TERMINALS = ((80, 24), (100, 30), (120, 40), (160, 48), (200, 60), (250, 70))
+GRID_TAB_HEIGHT = 3
+
+
+@lru_cache(maxsize=None)
+def symbol_table():
+    return np.array(list(SYMBOLS))
+
+
+def shade_planes(resized_image: np.ndarray):
+    gray_image = cv2.cvtColor(resized_image, cv2.COLOR_RGB2GRAY)
+    indices = (gray_image * (len(SYMBOLS) / 256)).astype(np.int32)
+    indices = np.clip(indices, 0, len(SYMBOLS) - 1)
+
+    left = resized_image[:, :-1, :].astype(np.float32)
+    right = resized_image[:, 1:, :].astype(np.float32)
+    avg_colors = np.sqrt((left ** 2 + right ** 2) / 2).astype(np.uint8)
+
+    last_col = avg_colors[:, -1:, :]
+    avg_colors = np.concatenate([avg_colors, last_col], axis=1)
+    return indices, avg_colors
+
+
+def grid_name(background: str, width: int, height: int) -> str:
+    digest = hashlib.sha1(normalize(background).encode("utf-8")).hexdigest()[:16]
+    return f"{GRID_DIR}/{digest}/{width}x{height}.npy"
+
+
+class GridBuilder:
+    def __init__(self, out_dir: str = BUILD_DIR) -> None:
+        self.out_dir = out_dir
+
+    def build(self, backgrounds) -> list:
+        index = {}
+        files = []
+        for background in dict.fromkeys(normalize(b) for b in backgrounds):
+            image = cv2.imread(background)
+            if image is None:
+                logging.warning(f"background {background} can't be decoded, no grids for it")
+                continue
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            sizes = []
+            for term_w, term_h in GRID_TERMINALS:
+                width = min(term_w, image.shape[1])
+                height = min(term_h, image.shape[0]) - GRID_TAB_HEIGHT
+                if height <= 0 or [width, height] in sizes:
+                    continue
+                resized_image = cv2.resize(image, (width, height), interpolation=cv2.INTER_NEAREST)
+                indices, avg_colors = shade_planes(resized_image)
+                grid = np.concatenate([resized_image, avg_colors, indices[..., None].astype(np.uint8)], axis=2)
+                arcname = grid_name(background, width, height)
+                path = os.path.join(self.out_dir, arcname)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                np.save(path, grid)
+                files.append((path, arcname))
+                sizes.append([width, height])
+            index[background] = {"shape": list(image.shape[:2]), "sizes": sizes}
+
+        path = os.path.join(self.out_dir, GRID_INDEX)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(dumps(index))
+        files.append((path, GRID_INDEX))
+        return files
+
+
+class GridIndex:
+    def __init__(self, fs=LOCAL_FS) -> None:
+        self.fs = fs
+        self.index = {}
+        if fs.exists(GRID_INDEX):
+            self.index = loads(fs.read_text(GRID_INDEX))
+            logging.info(f"precomputed grids for {len(self.index)} backgrounds")
+
+    def shape(self, background: str):
+        entry = self.index.get(normalize(background))
+        return None if entry is None else tuple(entry["shape"])
+
+    def nearest(self, background: str, width: int, height: int):
+        # the smallest grid that still covers the target, so resampling only ever shrinks
+        entry = self.index.get(normalize(background))
+        if entry is None:
+            return None
+        candidates = [(gw * gh, gw, gh) for gw, gh in entry["sizes"] if gw >= width and gh >= height]
+        if not candidates:
+            return None
+        _, gw, gh = min(candidates)
+        return np.load(io.BytesIO(self.fs.read(grid_name(background, gw, gh))))
+
+    def lookup_image(self, background: str, width: int, height: int):
+        grid = self.nearest(background, width, height)
+        if grid is None:
+            return None
+        return cv2.resize(np.ascontiguousarray(grid[..., :3]), (width, height), interpolation=cv2.INTER_NEAREST)
+
+    def lookup(self, background: str, w: int, h: int, tab_height: int):
+        shape = self.shape(background)
+        if shape is None:
+            return None
+        image_h, image_w = shape
+        width = min(w, image_w)
+        height = min(h, image_h) - tab_height
+        grid = self.nearest(background, width, height)
+        if grid is None:
+            return None
+        gh, gw = grid.shape[:2]
+        if (gw, gh) == (width, height):
+            return np.ascontiguousarray(grid[..., :3]), np.ascontiguousarray(grid[..., 3:6]), grid[..., 6].astype(np.int32)
+        resized_image = cv2.resize(np.ascontiguousarray(grid[..., :3]), (width, height), interpolation=cv2.INTER_NEAREST)
+        indices, avg_colors = shade_planes(resized_image)
+        return resized_image, avg_colors, indices
@@ -1,6 +1,56 @@
 from ..config import *
 from .nvlrc import NVLRCParser
+from .bundle import NVLBundleBuilder
+from .grids import GridBuilder, BUILD_DIR
+from .vfs import PackageFS, MANIFEST_NAME
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from json import dumps, loads
+import hashlib
+import struct
+import time
 import zipfile
+import zlib
+
+# already compressed formats gain nothing from deflate
+STORED_EXTENSIONS = {
+    ".jpg", ".jpeg", ".png", ".webp", ".gif",
+    ".mp3", ".ogg", ".opus", ".flac", ".m4a",
+    ".zip", ".gz", ".nvlpkg",
+}
+
+LOCAL_HEADER_SIG = b"PK\x03\x04"
+CENTRAL_HEADER_SIG = b"PK\x01\x02"
+END_SIG = b"PK\x05\x06"
+LOCAL_HEADER = struct.Struct("<4s5H3I2H")
+CENTRAL_HEADER = struct.Struct("<4s6H3I5H2I")
+END_RECORD = struct.Struct("<4s4H2IH")
+UTF8_FLAG = 0x800
+ZIP_LIMIT = 0xFFFFFFFF
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_member(path: str, method: int):
+    with open(path, "rb") as f:
+        data = f.read()
+    crc, size = zlib.crc32(data), len(data)
+    if method == zipfile.ZIP_DEFLATED:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+        compressed = compressor.compress(data) + compressor.flush()
+        if len(compressed) < size:
+            return crc, size, zipfile.ZIP_DEFLATED, compressed
+    return crc, size, zipfile.ZIP_STORED, data
+
+
+def dos_time(mtime: float):
+    t = time.localtime(max(mtime, 315532800))
+    return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
 
 class NVLPKGBuilder:
     def __init__(self) -> None:
@@ -12,13 +62,25 @@ class NVLPKGBuilder:
             with open('.include-dirs', 'r') as f:
                 self.dirs = f.read().split('\n')
     
+    def check_scripts(self, scenes: list) -> None:
+        try:
+            from lupa.lua54 import LuaRuntime
+        except ImportError:
+            from lupa import LuaRuntime
+        from ..capatibilities.script_cache import ScriptCache
+        cache = ScriptCache(LuaRuntime(unpack_returned_tuples=True))  # type: ignore
+        errors = cache.precompile(scene["script"] for scene in scenes if "script" in scene)
+        for path, error in errors:
+            print(f"Warning: script {path} does not compile: {error}")
+        print(f"🔎 checked {len(cache.chunks) + len(errors)} scripts")
+
     def build(self, out_name: str = "MyNovella.nvlpkg") -> None:
         print(f"Building {out_name} ...")
 
         include_dirs = self.dirs or ['scenes', 'images']
         files_to_add = []
 
-        required_files = ['metadata.json', 'config.json', 'save.json']
+        required_files = ['.nvlrc', 'metadata.json', 'config.json', 'save.json']
         for rf in required_files:
             if os.path.exists(rf):
                 files_to_add.append((rf, rf))
@@ -35,11 +97,124 @@ class NVLPKGBuilder:
                     rel_path = os.path.relpath(full_path, '.')
                     files_to_add.append((full_path, rel_path))
 
-        with zipfile.ZipFile(out_name, 'w', zipfile.ZIP_DEFLATED) as archive:
-            for full_path, arcname in files_to_add:
-                archive.write(full_path, arcname)
-                print(f"➕ added: {arcname}")
+        bundle = self.parser.get_scene_bundle()
+        bundle_file = ""
+        scene_dir = self.parser.get_scene_dir()
+        if bundle and os.path.isdir(scene_dir):
+            # built aside so the local scenes.nvlb, if any, stays the user's own
+            arcname = os.path.relpath(bundle, '.')
+            bundle_file = os.path.join(BUILD_DIR, arcname)
+            os.makedirs(os.path.dirname(bundle_file), exist_ok=True)
+            bundle_builder = NVLBundleBuilder(scene_dir)
+            count = bundle_builder.build(bundle_file)
+            files_to_add.append((bundle_file, arcname))
+            print(f"📦 compiled {count} scenes into {arcname}")
+            self.check_scripts(bundle_builder.load_scenes())
+
+        if self.parser.get_pack_grids() and os.path.isdir(scene_dir):
+            scenes = NVLBundleBuilder(scene_dir).load_scenes()
+            grid_files = GridBuilder().build(s["background"] for s in scenes if s.get("background"))
+            files_to_add.extend(grid_files)
+            print(f"🖼  precomputed {len(grid_files) - 1} background grids")
+
+        self.write_package(out_name, files_to_add, stored={bundle_file})
 
         print(f"Done! {out_name} created.")
 
+    def load_previous(self, out_name: str):
+        if not os.path.exists(out_name):
+            return None, {}
+        try:
+            previous = PackageFS(out_name)
+        except (OSError, zipfile.BadZipFile, ValueError) as e:
+            print(f"Warning: previous {out_name} is unreadable ({e}), rebuilding everything.")
+            return None, {}
+        if not previous.exists(MANIFEST_NAME):
+            return previous, {}
+        manifest = loads(previous.read_text(MANIFEST_NAME))
+        by_digest = {entry["sha256"]: name for name, entry in manifest["files"].items()}
+        return previous, by_digest
+
+    def write_package(self, out_name: str, files_to_add: list, stored=()) -> None:
+        with ThreadPoolExecutor() as pool:
+            digests = list(pool.map(file_digest, [full_path for full_path, _ in files_to_add]))
+
+        canonical = {}
+        aliases = {}
+        entries = []
+        for (full_path, arcname), digest in zip(files_to_add, digests):
+            arcname = arcname.replace(os.sep, "/")
+            if digest in canonical:
+                aliases[arcname] = canonical[digest]
+                print(f"🔗 alias: {arcname} -> {canonical[digest]}")
+                continue
+            canonical[digest] = arcname
+            ext = os.path.splitext(full_path)[1].lower()
+            method = zipfile.ZIP_STORED if ext in STORED_EXTENSIONS or full_path in stored else zipfile.ZIP_DEFLATED
+            entries.append({"path": full_path, "name": arcname, "sha256": digest, "method": method})
+
+        previous, previous_digests = self.load_previous(out_name)
+        jobs = {}
+        with ProcessPoolExecutor() as pool:
+            for entry in entries:
+                old_name = previous_digests.get(entry["sha256"])
+                if old_name is not None:
+                    old_info = previous.members[old_name][0]
+                    if entry["method"] == zipfile.ZIP_STORED or old_info.compress_type == entry["method"]:
+                        entry["method"] = old_info.compress_type
+                        entry["reuse"] = old_name
+                        continue
+                if entry["method"] == zipfile.ZIP_DEFLATED:
+                    jobs[entry["name"]] = pool.submit(read_member, entry["path"], entry["method"])
+
+            tmp_name = out_name + ".tmp"
+            manifest = {"files": {}, "aliases": aliases}
+            central = []
+            with open(tmp_name, "wb") as out:
+                for entry in entries:
+                    if "reuse" in entry:
+                        old_info = previous.members[entry["reuse"]][0]
+                        crc, size, data = old_info.CRC, old_info.file_size, previous.read_raw(entry["reuse"])
+                        print(f"♻️ reused: {entry['name']}")
+                    else:
+                        if entry["name"] in jobs:
+                            crc, size, entry["method"], data = jobs.pop(entry["name"]).result()
+                        else:
+                            crc, size, entry["method"], data = read_member(entry["path"], entry["method"])
+                        print(f"➕ added: {entry['name']}")
+                    central.append(self.write_member(out, entry["name"], entry["method"], crc, size, data,
+                                                     os.path.getmtime(entry["path"])))
+                    manifest["files"][entry["name"]] = {"sha256": entry["sha256"], "size": size}
+
+                data = dumps(manifest, indent=1).encode("utf-8")
+                compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+                central.append(self.write_member(out, MANIFEST_NAME, zipfile.ZIP_DEFLATED, zlib.crc32(data),
+                                                 len(data), compressor.compress(data) + compressor.flush(), time.time()))
+                self.write_central(out, central)
+
+        if previous is not None:
+            previous.close()
+        os.replace(tmp_name, out_name)
+
+    @staticmethod
+    def write_member(out, name: str, method: int, crc: int, size: int, data, mtime: float) -> bytes:
+        offset = out.tell()
+        encoded = name.encode("utf-8")
+        if size > ZIP_LIMIT or len(data) > ZIP_LIMIT or offset > ZIP_LIMIT:
+            raise ValueError(f"{name} needs zip64, which the package writer does not support")
+        mod_time, mod_date = dos_time(mtime)
+        out.write(LOCAL_HEADER.pack(LOCAL_HEADER_SIG, 20, UTF8_FLAG, method, mod_time, mod_date,
+                                    crc, len(data), size, len(encoded), 0))
+        out.write(encoded)
+        out.write(data)
+        return CENTRAL_HEADER.pack(CENTRAL_HEADER_SIG, 0x0314, 20, UTF8_FLAG, method, mod_time, mod_date,
+                                   crc, len(data), size, len(encoded), 0, 0, 0, 0, 0o644 << 16, offset) + encoded
 
+    @staticmethod
+    def write_central(out, central: list) -> None:
+        if len(central) > 0xFFFF:
+            raise ValueError("too many package members for a non-zip64 archive")
+        offset = out.tell()
+        out.writelines(central)
+        size = out.tell() - offset
+        out.write(END_RECORD.pack(END_SIG, 0, 0, len(central), len(central), size, offset, 0))
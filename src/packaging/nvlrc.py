@@ -1,38 +1,101 @@
 from ..config import *
+from .vfs import LOCAL_FS
 
 class NVLRCParser:
-    def __init__(self, name: str = '.nvlrc'):
+    def __init__(self, name: str = '.nvlrc', fs=LOCAL_FS):
         self.name = name
         self.scene_dir = ""
         self.nvl_name = ""
         self.save_file = ""
+        self.render_mode = "ansi"
+        self.frame_cache_mb = 64
+        self.frame_cache_dir = ""
+        self.prefetch_workers = 2
+        self.color_tolerance = 0
+        self.frame_byte_budget = 0
+        self.scene_cache = 256
+        self.scene_bundle = "scenes.nvlb"
+        self.precompile_scripts = False
+        self.save_snapshot_every = 50
+        self.pack_grids = False
+        self.trace = False
+        self.trace_file = ""
+        self.trace_buffer = 100000
+        self.audio_backend = "pygame"
+        self.audio_cache_mb = 32
+        self.crossfade_ms = 600
+        self.history_size = 100
+        self.script_budget_ms = 1000
+        self.script_budget_instructions = 0
+        self.script_profile = False
 
         logging.info("initialize nvlrc")
 
-        if os.path.exists(name):
-            with open(self.name, 'r') as f:
-                args = f.read().splitlines()
+        if fs.exists(name):
+            args = fs.read_text(self.name).splitlines()
+            raw_pairs = [line.split("=", 1) for line in args if "=" in line]
+            config = {k.strip(): v.strip() for k, v in raw_pairs}
 
-                raw_pairs = [line.split("=", 1) for line in args if "=" in line]
-                config = {k.strip(): v.strip() for k, v in raw_pairs}
+            self.nvl_name = config.get("nvl-name", "")
+            self.scene_dir = config.get("scene-dir", "")
+            self.save_file = config.get("save-file", "")
+            self.render_mode = config.get("render-mode", self.render_mode)
+            self.frame_cache_dir = config.get("frame-cache-dir", "")
+            self.frame_cache_mb = self._int_option(config, "frame-cache-mb", self.frame_cache_mb)
+            self.prefetch_workers = self._int_option(config, "prefetch-workers", self.prefetch_workers)
+            self.color_tolerance = self._int_option(config, "color-tolerance", self.color_tolerance)
+            self.frame_byte_budget = self._int_option(config, "frame-byte-budget", self.frame_byte_budget)
+            self.scene_cache = self._int_option(config, "scene-cache", self.scene_cache)
+            self.scene_bundle = config.get("scene-bundle", self.scene_bundle)
+            self.precompile_scripts = self._bool_option(config, "precompile-scripts", self.precompile_scripts)
+            self.save_snapshot_every = self._int_option(config, "save-snapshot-every", self.save_snapshot_every)
+            self.pack_grids = self._bool_option(config, "pack-grids", self.pack_grids)
+            self.trace = self._bool_option(config, "trace", self.trace)
+            self.trace_file = config.get("trace-file", self.trace_file)
+            self.trace_buffer = self._int_option(config, "trace-buffer", self.trace_buffer)
+            self.audio_backend = config.get("audio-backend", self.audio_backend)
+            self.audio_cache_mb = self._int_option(config, "audio-cache-mb", self.audio_cache_mb)
+            self.crossfade_ms = self._int_option(config, "crossfade-ms", self.crossfade_ms)
+            self.history_size = self._int_option(config, "history-size", self.history_size)
+            self.script_budget_ms = self._int_option(config, "script-budget-ms", self.script_budget_ms)
+            self.script_budget_instructions = self._int_option(
+                config, "script-budget-instructions", self.script_budget_instructions
+            )
+            self.script_profile = self._bool_option(config, "script-profile", self.script_profile)
 
-                self.nvl_name = config.get("nvl-name", "")
-                self.scene_dir = config.get("scene-dir", "")
-                self.save_file = config.get("save-file", "")
-
-                if not self.nvl_name:
-                    logging.warning("novell name not setted in nvlrc, be care")
-                if not self.scene_dir:
-                    logging.critical("scene dir is not setted in nvlrc, novell cannot load")
-                    exit(-1)
-                if not self.save_file:
-                    logging.critical("save file name not found")
-                    exit(-1)
+            if not self.nvl_name:
+                logging.warning("novell name not setted in nvlrc, be care")
+            if not self.scene_dir:
+                logging.critical("scene dir is not setted in nvlrc, novell cannot load")
+                exit(-1)
+            if not self.save_file:
+                logging.critical("save file name not found")
+                exit(-1)
+            if self.audio_backend not in AUDIO_BACKENDS:
+                logging.warning(f"unknown audio backend {self.audio_backend}, falling back to pygame")
+                self.audio_backend = "pygame"
+            if self.render_mode not in RENDER_MODES:
+                logging.warning(f"unknown render mode {self.render_mode}, falling back to ansi")
+                self.render_mode = "ansi"
 
         else:
             logging.critical("nvlrc not found, maybe this not novell directory")
             exit(-1)
 
+    @staticmethod
+    def _int_option(config: dict, key: str, default: int) -> int:
+        try:
+            return int(config.get(key, default))
+        except ValueError:
+            logging.warning(f"{key} must be an integer, using default {default}")
+            return default
+
+    @staticmethod
+    def _bool_option(config: dict, key: str, default: bool) -> bool:
+        if key not in config:
+            return default
+        return config[key].lower() in ("1", "true", "yes", "on")
+
     def get_scene_dir(self) -> str:
         return self.scene_dir
 
@@ -41,3 +104,66 @@ class NVLRCParser:
 
     def get_save_file(self) -> str:
         return self.save_file
+
+    def get_render_mode(self) -> str:
+        return self.render_mode
+
+    def get_frame_cache_mb(self) -> int:
+        return self.frame_cache_mb
+
+    def get_frame_cache_dir(self) -> str:
+        return self.frame_cache_dir
+
+    def get_prefetch_workers(self) -> int:
+        return self.prefetch_workers
+
+    def get_color_tolerance(self) -> int:
+        return self.color_tolerance
+
+    def get_frame_byte_budget(self) -> int:
+        return self.frame_byte_budget
+
+    def get_scene_cache(self) -> int:
+        return self.scene_cache
+
+    def get_scene_bundle(self) -> str:
+        return self.scene_bundle
+
+    def get_precompile_scripts(self) -> bool:
+        return self.precompile_scripts
+
+    def get_save_snapshot_every(self) -> int:
+        return self.save_snapshot_every
+
+    def get_pack_grids(self) -> bool:
+        return self.pack_grids
+
+    def get_trace(self) -> bool:
+        return self.trace
+
+    def get_trace_file(self) -> str:
+        return self.trace_file
+
+    def get_trace_buffer(self) -> int:
+        return self.trace_buffer
+
+    def get_audio_backend(self) -> str:
+        return self.audio_backend
+
+    def get_audio_cache_mb(self) -> int:
+        return self.audio_cache_mb
+
+    def get_crossfade_ms(self) -> int:
+        return self.crossfade_ms
+
+    def get_history_size(self) -> int:
+        return self.history_size
+
+    def get_script_budget_ms(self) -> int:
+        return self.script_budget_ms
+
+    def get_script_budget_instructions(self) -> int:
+        return self.script_budget_instructions
+
+    def get_script_profile(self) -> bool:
+        return self.script_profile
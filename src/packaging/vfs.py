@@ -0,0 +1,147 @@
+from ..config import *
+import mmap
+import posixpath
+import struct
+import sys
+import zipfile
+import zlib
+from json import loads
+
+# signature, version, flags, method, time, date, crc, sizes, name length, extra length
+LOCAL_HEADER = struct.Struct("<4s5H3I2H")
+# written by NVLPKGBuilder: content hashes and paths deduplicated onto one member
+MANIFEST_NAME = ".nvlpkg-manifest.json"
+
+
+def normalize(path: str) -> str:
+    path = posixpath.normpath(path.replace("\\", "/"))
+    return "" if path == "." else path.lstrip("/")
+
+
+ASSET_PATHS: dict = {}
+
+
+def asset_path(path: str) -> str:
+    # one interned string per asset, so "./images/a.webp" and "images/a.webp" hit the same
+    # frame cache, grid and audio entries. Absolute paths stay absolute for the local fs
+    canonical = ASSET_PATHS.get(path)
+    if canonical is None:
+        canonical = posixpath.normpath(path.replace("\\", "/")) if path else ""
+        canonical = ASSET_PATHS[path] = sys.intern("" if canonical == "." else canonical)
+    return canonical
+
+
+class LocalFS:
+    def exists(self, path: str) -> bool:
+        return os.path.exists(path)
+
+    def isdir(self, path: str) -> bool:
+        return os.path.isdir(path)
+
+    def listdir(self, path: str) -> list:
+        return os.listdir(path)
+
+    def stat(self, path: str) -> tuple:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def realpath(self, path: str) -> str:
+        return os.path.realpath(path)
+
+    def read(self, path: str):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def read_text(self, path: str) -> str:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+
+
+class PackageFS:
+    def __init__(self, archive: str) -> None:
+        self.archive = os.path.realpath(archive)
+        self.mtime = os.stat(self.archive).st_mtime_ns
+        self.file = open(self.archive, "rb")
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.mm)
+        self.members: dict = {}
+        self.dirs: dict = {"": set()}
+        # zipfile only parses the central directory here, member data stays in the mapping
+        with zipfile.ZipFile(self.file) as zf:
+            for info in zf.infolist():
+                if info.is_dir():
+                    continue
+                _, _, _, _, _, _, _, _, _, name_len, extra_len = LOCAL_HEADER.unpack_from(self.mm, info.header_offset)
+                start = info.header_offset + LOCAL_HEADER.size + name_len + extra_len
+                name = normalize(info.filename)
+                self.members[name] = (info, start)
+                self._add_parents(name)
+        if MANIFEST_NAME in self.members:
+            aliases = loads(self.read_text(MANIFEST_NAME)).get("aliases", {})
+            for alias, target in aliases.items():
+                if target in self.members:
+                    self.members[normalize(alias)] = self.members[target]
+                    self._add_parents(normalize(alias))
+        logging.info(f"mounted {self.archive} with {len(self.members)} members")
+
+    def _add_parents(self, name: str):
+        parent, child = posixpath.split(name)
+        while True:
+            self.dirs.setdefault(parent, set()).add(child)
+            if not parent:
+                break
+            parent, child = posixpath.split(parent)
+
+    def exists(self, path: str) -> bool:
+        path = normalize(path)
+        return path in self.members or path in self.dirs
+
+    def isdir(self, path: str) -> bool:
+        return normalize(path) in self.dirs
+
+    def listdir(self, path: str) -> list:
+        path = normalize(path)
+        if path not in self.dirs:
+            raise FileNotFoundError(path)
+        return sorted(self.dirs[path])
+
+    def stat(self, path: str) -> tuple:
+        path = normalize(path)
+        if path in self.dirs:
+            return self.mtime, 0
+        info, _ = self._member(path)
+        return self.mtime, info.file_size
+
+    def realpath(self, path: str) -> str:
+        return f"{self.archive}!/{normalize(path)}"
+
+    def _member(self, path: str):
+        member = self.members.get(normalize(path))
+        if member is None:
+            raise FileNotFoundError(path)
+        return member
+
+    def read_raw(self, path: str):
+        info, start = self._member(path)
+        return self.view[start:start + info.compress_size]
+
+    def read(self, path: str):
+        info, _ = self._member(path)
+        data = self.read_raw(path)
+        if info.compress_type == zipfile.ZIP_STORED:
+            return data
+        if info.compress_type == zipfile.ZIP_DEFLATED:
+            return zlib.decompress(data, -15)
+        with zipfile.ZipFile(self.file) as zf:
+            return zf.read(info)
+
+    def read_text(self, path: str) -> str:
+        return str(self.read(path), "utf-8")
+
+    def close(self):
+        self.view.release()
+        self.mm.close()
+        self.file.close()
+
+
+LOCAL_FS = LocalFS()
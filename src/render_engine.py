@@ -1,85 +1,206 @@
 from .base import *
-import textwrap
-import cv2
-from rich.panel import Panel
-from rich.box import SQUARE
+from .capatibilities.encoder import *
+from .packaging.grids import shade_planes
+from .packaging.grids import symbol_table
+from .capatibilities.panel import *
+from functools import lru_cache
+import io
+
+@lru_cache(maxsize=64)
+def render_rich_panel(title: str, text: str, subtitle: str, width: int, style: str, color_system, terminal: bool):
+    from rich.panel import Panel
+    from rich.box import SQUARE
+    from rich.console import Console
+    panel = Panel(
+        text,
+        border_style=style,
+        box=SQUARE,
+        title=title,
+        title_align="center",
+        subtitle=subtitle,
+        subtitle_align="center",
+    )
+    # rendered on a private console so prefetch workers never touch self.console
+    console = Console(file=io.StringIO(), width=width, color_system=color_system, force_terminal=terminal)
+    console.print(panel)
+    rendered = console.file.getvalue()
+    return rendered, rendered.count("\n")
 
-cv2.ocl.setUseOpenCL(True)
 
 class RenderEngine(EngineBase):
-    def render_tab(self):
-        logging.debug("rendering tab" + str(self.id))
-        box_width = self.w - 2
-        inner_width = box_width - 2
-        if self.text:
-            raw_lines = self.text.splitlines()
-            text_lines = [
-                wrapped_line
-                for line in raw_lines
-                for wrapped_line in textwrap.wrap(line, inner_width)
-            ]
+    def build_tab(self, scene_id: int, text: str, person: str, width: int):
+        text, person = text or "", person or ""
+        style = self.theme_manager.get_theme().get("tab", {}).get("border", "white")
+        if needs_rich(text, person):
+            return render_rich_panel(
+                f"Scene {scene_id}", text, person, width, style, self.console.color_system, self.console.is_terminal
+            )
+        colored = self.console.is_terminal and self.console.color_system is not None
+        return render_panel(f"Scene {scene_id}", text, person, width, color_sgr(style) if colored else "")
+
+    def layout_tab(self) -> str:
+        key = (self.id, self.text, self.person, self.w)
+        if self.prefetched is not None and self.prefetched.tab_key == key:
+            rendered, self.tab_height = self.prefetched.tab
         else:
-            text_lines = [""]
-        panel_text = "\n".join(text_lines)
-        panel = Panel(
-            panel_text,
-            border_style="white",
-            box=SQUARE,
-            title=f"Scene {self.id}",
-            title_align="center",
-            subtitle=self.person,
-            subtitle_align="center",
-        )
-        self.tab_height = len(text_lines) + 2
-        self.console.print(panel)
+            with TRACER.span("tab"):
+                rendered, self.tab_height = self.build_tab(*key)
+        return rendered
 
-    def render_scene(self):
-        logging.debug(f'rendering scene: {self.id}')
-        file_path = self.background
-        if not os.path.exists(file_path):
-            logging.warning("background isn't exist, skiping...")
-            return
+    def render_tab(self):
+        logging.debug("rendering tab %s", self.id)
+        rendered = self.layout_tab()
+        with TRACER.span("write"):
+            self.console.file.write(rendered)
+            self.console.file.flush()
 
-        image = cv2.imread(file_path)
+    @staticmethod
+    def prepare_scene(file_path: str, w: int, h: int, tab_height: int, fs=LOCAL_FS, grids=None):
+        if grids is not None:
+            with TRACER.span("grid"):
+                planes = grids.lookup(file_path, w, h, tab_height)
+            if planes is not None:
+                resized_image, avg_colors, indices = planes
+                return resized_image, avg_colors, symbol_table()[indices]
+
+        with TRACER.span("decode"):
+            image = cv2.imdecode(np.frombuffer(fs.read(file_path), dtype=np.uint8), cv2.IMREAD_COLOR)
         if image is None:
             logging.critical(f"cv2 cant read {file_path}, corrupted?")
             exit(-1)
 
         image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        term_width = min(self.w, image.shape[1])
-        term_height = min(self.h, image.shape[0])
+        term_width = min(w, image.shape[1])
+        term_height = min(h, image.shape[0])
+
+        with TRACER.span("resize"):
+            resized_image = cv2.resize(
+                image,
+                (term_width, term_height - tab_height),
+                interpolation=cv2.INTER_NEAREST,
+            )
+            indices, avg_colors = shade_planes(resized_image)
+        return resized_image, avg_colors, symbol_table()[indices]
+
+    @staticmethod
+    def prepare_halfblock(file_path: str, w: int, h: int, tab_height: int, fs=LOCAL_FS, grids=None):
+        # every cell is an upper half block: fg paints the top pixel, bg the one below it,
+        # so the same cell grid carries twice the vertical resolution
+        shape = None if grids is None else grids.shape(file_path)
+        image = None
+        if shape is None:
+            with TRACER.span("decode"):
+                image = cv2.imdecode(np.frombuffer(fs.read(file_path), dtype=np.uint8), cv2.IMREAD_COLOR)
+            if image is None:
+                logging.critical(f"cv2 cant read {file_path}, corrupted?")
+                exit(-1)
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            shape = image.shape[:2]
+
+        width = min(w, shape[1])
+        rows = min(h, shape[0]) - tab_height
+        resized_image = None
+        if image is None:
+            with TRACER.span("grid"):
+                resized_image = grids.lookup_image(file_path, width, rows * 2)
+            if resized_image is None:
+                return RenderEngine.prepare_halfblock(file_path, w, h, tab_height, fs)
+        else:
+            with TRACER.span("resize"):
+                resized_image = cv2.resize(image, (width, rows * 2), interpolation=cv2.INTER_NEAREST)
+        top = np.ascontiguousarray(resized_image[0::2])
+        bottom = np.ascontiguousarray(resized_image[1::2])
+        return top, bottom, np.full(top.shape[:2], HALF_BLOCK)
+
+    def write_frame(self, data: bytes):
+        with TRACER.span("write"):
+            self._write_frame(data)
+
+    def _write_frame(self, data: bytes):
+        out = self.console.file
+        buffer = getattr(out, "buffer", None)
+        out.flush()
+        if buffer is not None:
+            buffer.write(data)
+            buffer.flush()
+        else:
+            out.write(data.decode("utf-8"))
+            out.flush()
 
-        resized_image = cv2.resize(
-            image,
-            (term_width, term_height - self.tab_height),
-            interpolation=cv2.INTER_NEAREST,
+    def build_frame(self, file_path: str, w: int, h: int, tab_height: int) -> Frame:
+        if self.render_mode == "halfblock":
+            prepare = self.prepare_halfblock
+        else:
+            prepare = self.prepare_scene
+        resized_image, avg_colors, symbols = prepare(file_path, w, h, tab_height, self.fs, self.grids)
+        with TRACER.span("encode"):
+            if self.render_mode != "rich":
+                resized_image, avg_colors, payload = encode_budgeted(
+                    resized_image, avg_colors, symbols, self.color_tolerance, self.frame_byte_budget
+                )
+            else:
+                payload = encode_rich(resized_image, avg_colors, symbols)
+        return Frame(resized_image, avg_colors, symbols, payload)
+
+    def frame_key(self, file_path: str, w: int, h: int, tab_height: int) -> tuple:
+        return self.frame_cache.make_key(
+            self.fs, file_path, w, h, tab_height, self.render_mode, self.color_tolerance, self.frame_byte_budget
         )
 
-        gray_image = cv2.cvtColor(resized_image, cv2.COLOR_RGB2GRAY)
-        indices = (gray_image * (len(SYMBOLS) / 256)).astype(np.int32)
-        indices = np.clip(indices, 0, len(SYMBOLS) - 1)
-        symbols = SYMBOLS[indices]
+    def get_frame(self, file_path: str) -> Frame:
+        key = self.frame_key(file_path, self.w, self.h, self.tab_height)
+        if self.prefetched is not None and self.prefetched.frame_key == key:
+            frame = self.prefetched.frame
+        else:
+            frame = self.cached_frame(key, file_path, self.w, self.h, self.tab_height)
+        self.shown_frame_key = key
+        return frame
 
-        left = resized_image[:, :-1, :].astype(np.float32)
-        right = resized_image[:, 1:, :].astype(np.float32)
-        avg_colors = np.sqrt((left ** 2 + right ** 2) / 2).astype(np.uint8)
+    def cached_frame(self, key: tuple, file_path: str, w: int, h: int, tab_height: int) -> Frame:
+        frame = self.frame_cache.get(key)
+        if frame is None:
+            frame = self.build_frame(file_path, w, h, tab_height)
+            self.frame_cache.put(key, frame)
+        return frame
 
-        last_col = avg_colors[:, -1:, :]
-        avg_colors = np.concatenate([avg_colors, last_col], axis=1)
+    def render_scene(self):
+        logging.debug("rendering scene: %s", self.id)
+        file_path = self.background
+        if not self.fs.exists(file_path):
+            logging.warning("background isn't exist, skiping...")
+            return
 
-        output = []
-        for row_pixels, row_avg_colors, row_symbols in zip(resized_image, avg_colors, symbols):
-            line = "".join(
-                f"[#{r:02x}{g:02x}{b:02x} on #{rb:02x}{gb:02x}{bb:02x}]{s}[/]"
-                for (r, g, b), (rb, gb, bb), s in zip(row_pixels, row_avg_colors, row_symbols)
-            )
-            output.append(line)
+        frame = self.get_frame(file_path)
+        self.frame_bytes = len(frame.payload)
+        if self.render_mode != "rich":
+            self.write_frame(frame.payload)
+        else:
+            self.console.print(frame.payload, end="")
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug("frame cache: %s", self.frame_cache.stats())
 
-        self.console.print("\n".join(output), end="")
+    def render_diff(self):
+        # the panel is laid out first, the background is sized around its height
+        tab = self.layout_tab()
+        frame = None
+        if self.fs.exists(self.background):
+            frame = self.get_frame(self.background)
+            self.frame_bytes = len(frame.payload)
+        else:
+            logging.warning("background isn't exist, skiping...")
+        lines = tab.splitlines() if self.show_tab else []
+        with TRACER.span("diff"):
+            data = self.framebuffer.update(frame, lines, (self.w, self.h))
+        self.write_frame(data)
+        logging.debug("frame: %s bytes encoded, %s bytes written", self.frame_bytes, self.framebuffer.last_bytes)
 
     def render(self, render_tab: bool):
-        logging.info(f"rendering: {self.id}")
+        logging.info("rendering: %s", self.id)
+        if self.render_mode != "rich":
+            self.render_diff()
+            return
         self.console.clear()
+        self.layout_tab()
         self.render_scene()
         if self.show_tab:
             self.render_tab()
\ No newline at end of file
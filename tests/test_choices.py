@@ -0,0 +1,23 @@
+from src.capatibilities.lua_bridge import ChoiceMap
+
+
+def test_freeze_keeps_every_version():
+    choices = ChoiceMap({"a": "1"})
+    first = choices.freeze()
+    choices["b"] = "2"
+    choices["a"] = None
+    second = choices.freeze()
+    assert first.to_dict() == {"a": "1"}
+    assert second.to_dict() == {"b": "2"}
+    assert "a" not in second and second["b"] == "2"
+
+
+def test_thawed_map_copies_on_first_write():
+    frozen = ChoiceMap({"a": "1", "b": "2"}).freeze()
+    choices = ChoiceMap.thaw(frozen)
+    assert choices["a"] == "1" and choices["missing"] is None and len(choices) == 2
+    assert choices.data is None and choices.freeze() is frozen
+    choices["a"] = "3"
+    assert dict(choices) == {"a": "3", "b": "2"}
+    assert frozen.to_dict() == {"a": "1", "b": "2"}
+    assert choices.drain_changes() == ({"a": "3"}, [])
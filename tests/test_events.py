@@ -0,0 +1,30 @@
+import os
+
+from src.capatibilities.events import EventSource, ADVANCE, BACK
+
+
+class ListQueue(list):
+    def put_nowait(self, item):
+        self.append(item)
+
+
+def read_events(data: bytes) -> list:
+    source = EventSource(None, True, lambda: (80, 24))
+    source.queue = ListQueue()
+    read_fd, write_fd = os.pipe()
+    try:
+        os.write(write_fd, data)
+        source._read_keys(read_fd)
+    finally:
+        os.close(read_fd)
+        os.close(write_fd)
+    return source.queue
+
+
+def test_keys_in_one_read_keep_their_order():
+    assert read_events(b"b\n") == [BACK, ADVANCE]
+    assert read_events(b"\n\x1b[D \x7f") == [ADVANCE, BACK, ADVANCE, BACK]
+
+
+def test_unknown_bytes_are_ignored():
+    assert read_events(b"xq\x1b[A") == []
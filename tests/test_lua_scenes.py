@@ -0,0 +1,37 @@
+import pytest
+
+from benchmarks.headless import HeadlessEngine, generate_novel
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    generate_novel(str(tmp_path), scenes=5, images=1, script_density=0, music_density=0)
+    monkeypatch.chdir(tmp_path)
+    eng = HeadlessEngine(80, 24)
+    eng.register_scenes()
+    yield eng
+    eng.exit()
+
+
+def test_load_scene_from_lua_table(engine):
+    engine.lua.execute(
+        'engine.load_scene({id=2, text="from lua", person="Lua", background="images/bg0.png", advance_after=1.5})'
+    )
+    assert (engine.id, engine.text, engine.person, engine.background) == (2, "from lua", "Lua", "images/bg0.png")
+    assert engine.advance_after == 1.5
+
+
+def test_load_scene_from_lua_table_without_optional_fields(engine):
+    engine.lua.execute('engine.load_scene({id=3, text="plain", person="Lua", background="images/bg0.png"})')
+    assert (engine.id, engine.text) == (3, "plain")
+    assert engine.advance_after == 0
+
+
+def test_script_budget_from_lua_table(engine, tmp_path):
+    (tmp_path / "scripts" / "spin.lua").write_text("while true do end\n")
+    engine.lua.execute(
+        'engine.load_scene({id=4, text="spin", person="Lua", background="images/bg0.png",'
+        ' script="scripts/spin.lua", script_budget_instructions=20000, script_budget_ms=500})'
+    )
+    assert engine.script_budget == (20000, 0.5)
+    assert engine.scripts.stats["scripts/spin.lua"].aborted == 1
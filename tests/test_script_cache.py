@@ -0,0 +1,26 @@
+import pytest
+
+from src.base import load_lupa
+from src.capatibilities.script_cache import ScriptCache, ScriptBudgetExceeded
+
+
+@pytest.fixture
+def lua():
+    return load_lupa().LuaRuntime()
+
+
+def test_pcall_does_not_swallow_budget_abort(lua):
+    cache = ScriptCache(lua)
+    spin = lua.eval("function() while true do pcall(function() while true do end end) end end")
+    with pytest.raises(ScriptBudgetExceeded):
+        cache.call("spin.lua", spin, instructions=50000)
+    assert cache.stats["spin.lua"].aborted == 1
+    # pcall is the plain one again once the call is over
+    assert lua.execute("return pcall(error, 'x')") == (False, "x")
+
+
+def test_bridge_is_not_profiled(lua):
+    cache = ScriptCache(lua, profile=True)
+    bridge = lua.compile("return function(f) return f() end", name="=bridge")()
+    assert cache.call("scene.lua", bridge, lua.eval("function() return 1 end")) == 1
+    assert not any("bridge" in key for key in cache.function_stats())
@@ -7,6 +7,7 @@ class NVLRCParser:
         self.scene_dir = ""
         self.nvl_name = ""
         self.save_file = ""
+        self.scene_bundle = "scenes.nvlb"
 
         if os.path.exists(name):
             with open(self.name, 'r') as f:
@@ -18,9 +19,11 @@ class NVLRCParser:
                     for k, v in raw_pairs
                 }
 
-                self.nvl_name = config.get("novel_name", "")
+                # the engine reads nvl-name, older novels still spell it novel-name
+                self.nvl_name = config.get("nvl_name") or config.get("novel_name", "")
                 self.scene_dir = config.get("scene_dir", "")
                 self.save_file = config.get("save_file", "")
+                self.scene_bundle = config.get("scene_bundle", self.scene_bundle)
 
                 if not self.nvl_name:
                     raise ValidationError("Name of novell not setted in nvlrc.")
@@ -40,3 +43,6 @@ class NVLRCParser:
 
     def get_save_file(self) -> str:
         return self.save_file
+
+    def get_scene_bundle(self) -> str:
+        return self.scene_bundle
@@ -1,11 +1,23 @@
 import os
 import json
+import queue
 import customtkinter as ctk
 from tkinter import filedialog, messagebox
-from PIL import Image, ImageTk
+from PIL import ImageTk
+from .thumbnails import ThumbnailCache
+from .src.capatibilities.scene_store import SceneStore
+from .nvlrc_nodebug import NVLRCParser
+from .valid_ers import NVLRCNotFound, ValidationError
+
+def read_scene_dir() -> str:
+    # the engine's scene-dir from .nvlrc, so the IDE and the engine share one scene index
+    try:
+        return NVLRCParser().get_scene_dir()
+    except (NVLRCNotFound, ValidationError):
+        return "scenes"
 
 LAST_SCENE_PATH = ".last-scene.json"
-SCENE_DIR = "scenes"
+SCENE_DIR = read_scene_dir()
 ROOT_DIR = os.getcwd()  # корень новеллы, откуда запускается IDE
 
 ctk.set_appearance_mode("system")
@@ -28,10 +40,17 @@ class SceneEditor(ctk.CTk):
         }
 
         self.preview_img = None
+        self.preview_path = ""
+        self.thumbnails = ThumbnailCache()
+        # the same persistent index the engine keeps, so the next free id is known without listing the folder
+        os.makedirs(SCENE_DIR, exist_ok=True)
+        self.index = SceneStore(SCENE_DIR, bundle_path="")
 
         self._build_ui()
         self.bind_shortcuts()
         self.autoload_last()
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.after(50, self.poll_thumbnails)
 
     def _build_ui(self):
         btn_frame = ctk.CTkFrame(self)
@@ -86,25 +105,42 @@ class SceneEditor(ctk.CTk):
         if not os.path.exists(abs_path):
             self.preview_label.configure(text="🚫 image not found", image=None)
             return
-        try:
-            img = Image.open(abs_path)
-            img.thumbnail((300, 200))
+        self.preview_path = abs_path
+        self.preview_label.configure(text="⏳ loading preview...", image=None)
+        self.thumbnails.request(abs_path)
+
+    def poll_thumbnails(self):
+        # thumbnails are made on worker threads, PhotoImage has to be created here on the Tk thread
+        while True:
+            try:
+                path, img, error = self.thumbnails.results.get_nowait()
+            except queue.Empty:
+                break
+            if path != self.preview_path:
+                continue
+            if error is not None:
+                self.preview_label.configure(text="❌ failed to load image", image=None)
+                continue
             self.preview_img = ImageTk.PhotoImage(img)
             self.preview_label.configure(image=self.preview_img, text="")
-        except Exception:
-            self.preview_label.configure(text="❌ failed to load image", image=None)
+        self.after(50, self.poll_thumbnails)
+
+    def on_close(self):
+        self.thumbnails.shutdown()
+        self.destroy()
 
     def clear(self):
         self._auto_id()
         for key in self.vars:
             if key != "id":
                 self.vars[key].set("")
+        self.preview_path = ""
         self.preview_label.configure(image=None, text="🎞 background preview")
 
     def _auto_id(self):
-        os.makedirs(SCENE_DIR, exist_ok=True)
-        existing = [int(f.split(".")[0]) for f in os.listdir(SCENE_DIR) if f.endswith(".json") and f.split(".")[0].isdigit()]
-        next_id = max(existing) + 1 if existing else 1
+        if self.index.stale():
+            self.index.refresh()
+        next_id = self.index.last_id() + 1 if len(self.index) else 1
         self.vars["id"].set(str(next_id))
 
     def duplicate(self):
@@ -151,6 +187,7 @@ class SceneEditor(ctk.CTk):
             path = os.path.join(SCENE_DIR, f"{id_val}.json")
             with open(path, "w", encoding="utf-8") as f:
                 json.dump(scene, f, indent=4, ensure_ascii=False)
+            self.index.add(id_val, f"{id_val}.json")
 
             with open(LAST_SCENE_PATH, "w") as f:
                 json.dump({"last": path}, f)
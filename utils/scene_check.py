@@ -0,0 +1,37 @@
+import os
+from json import loads, JSONDecodeError
+
+REQUIRED_KEYS = ['music', 'script', 'background']
+# bump when check_scene changes, so cached results of the older checks are thrown away
+CHECK_VERSION = 2
+
+
+def check_scene(path: str):
+    # runs in a worker process: only parses, file references are checked by the caller
+    errors = []
+    refs = []
+    filename = os.path.basename(path)
+    try:
+        file_id = int(os.path.splitext(filename)[0])
+    except ValueError:
+        file_id = None
+        errors.append(f"Scene file {filename} must be named as an integer (e.g., 1.json, 2.json, ...).")
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            scene = loads(f.read())
+    except (OSError, UnicodeDecodeError, JSONDecodeError) as e:
+        errors.append(f"Failed to read or parse {path}: Invalid JSON in scene: {e}")
+        return errors, refs
+    if not isinstance(scene, dict):
+        errors.append(f"Failed to read or parse {path}: scene must be a JSON object")
+        return errors, refs
+    if file_id is not None and scene.get('id') != file_id:
+        errors.append(f"Scene file {filename} has ID = {scene.get('id', '?')}, expected {file_id} from its name.")
+    for key in REQUIRED_KEYS:
+        if key in scene:
+            refs.append((key, scene[key], scene.get('id', '?')))
+    return errors, refs
+
+
+def check_scenes(paths: list):
+    return [check_scene(path) for path in paths]
@@ -1,15 +1,27 @@
 from .nvlrc_nodebug import NVLRCParser
 from .valid_ers import *
+from .scene_check import check_scenes, CHECK_VERSION
+from concurrent.futures import ProcessPoolExecutor
 import sys
 import os
-from json import loads, JSONDecodeError, load
+from json import dumps, JSONDecodeError, load
 import argparse
 
+VALIDATE_CACHE = ".validate-cache.json"
+# below this many changed scenes a process pool costs more than it saves
+PARALLEL_THRESHOLD = 256
+
 class TNFDevTools:
     def __init__(self) -> None:
-        self.parser = NVLRCParser()
-        self.scenes_dir = self.parser.get_scene_dir()
-        self.save_file = self.parser.get_save_file()
+        # packages carry their own nvlrc, so a missing local one only matters for folder commands
+        try:
+            self.parser = NVLRCParser()
+            self.scenes_dir = self.parser.get_scene_dir()
+            self.save_file = self.parser.get_save_file()
+        except NVLRCNotFound:
+            self.parser = None
+            self.scenes_dir = ""
+            self.save_file = ""
         self.args = sys.argv[1:]
         self.count = 0
         self.checked_paths = set()
@@ -22,65 +34,109 @@ class TNFDevTools:
             return True
         return False
 
-    def validate_requirements(self, scene: dict, base_path: str = "."):
-        required_keys = ['music', 'script', 'background']
-        for key in required_keys:
-            if key in scene:
-                file_path = os.path.join(base_path, scene[key])
-                if not self.file_exists(file_path):
-                    raise RequirementsError(
-                        f"{key.capitalize()} file \"{scene[key]}\" not found for scene with ID = {scene.get('id', '?')}"
-                    )
-
-    def is_valid_json(self, text: str) -> bool:
+    def load_validate_cache(self) -> dict:
         try:
-            file = loads(text)
-            self.validate_requirements(file)
-            return True
-        except JSONDecodeError:
-            return False
+            with open(VALIDATE_CACHE, 'r', encoding='utf-8') as f:
+                cache = load(f)
+            if cache.get("scene_dir") == self.scenes_dir and cache.get("version") == CHECK_VERSION:
+                return cache["files"]
+        except (OSError, JSONDecodeError, KeyError, AttributeError):
+            pass
+        return {}
+
+    def save_validate_cache(self, files: dict) -> None:
+        tmp = VALIDATE_CACHE + ".tmp"
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(dumps({"version": CHECK_VERSION, "scene_dir": self.scenes_dir, "files": files}))
+            os.replace(tmp, VALIDATE_CACHE)
+        except OSError:
+            pass
+
+    def check_changed(self, paths: list) -> list:
+        if len(paths) < PARALLEL_THRESHOLD:
+            return check_scenes(paths)
+        chunk = max(1, len(paths) // (os.cpu_count() or 1) // 4)
+        chunks = [paths[i:i + chunk] for i in range(0, len(paths), chunk)]
+        with ProcessPoolExecutor() as pool:
+            return [result for results in pool.map(check_scenes, chunks) for result in results]
+
+    def scan_scenes(self) -> dict:
+        stats = {}
+        with os.scandir(self.scenes_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(".json") and entry.is_file():
+                    st = entry.stat()
+                    stats[entry.path] = [st.st_mtime_ns, st.st_size]
+        return stats
+
+    def update_cache(self, stats: dict):
+        # only scenes whose file changed since the last run are parsed again
+        cache = self.load_validate_cache()
+        changed = sorted(path for path, key in stats.items() if cache.get(path, {}).get("stat") != key)
+        for path, (errors, refs) in zip(changed, self.check_changed(changed)):
+            cache[path] = {"stat": stats[path], "errors": errors, "refs": refs}
+        if changed or len(cache) != len(stats):
+            cache = {path: cache[path] for path in stats}
+            self.save_validate_cache(cache)
+        return cache, changed
+
+    def report_errors(self, cache: dict, report: list) -> list:
+        # cached parse errors are reused, but referenced files are checked every time
+        errors = []
+        for path in report:
+            errors.extend(cache[path]["errors"])
+            for key, ref, scene_id in cache[path]["refs"]:
+                if not self.file_exists(os.path.join(".", ref)):
+                    errors.append(f"{key.capitalize()} file \"{ref}\" not found for scene with ID = {scene_id}")
+        return errors
+
+    def id_errors(self, stats: dict) -> list:
+        scene_ids = set()
+        for path in stats:
+            try:
+                scene_ids.add(int(os.path.splitext(os.path.basename(path))[0]))
+            except ValueError:
+                pass
+        expected_ids = set(range(1, len(stats) + 1))
+        if expected_ids == scene_ids:
+            return []
+        missing = expected_ids - scene_ids
+        extra = scene_ids - expected_ids
+        return [f"Scene IDs mismatch. Missing: {sorted(missing)}; Unexpected: {sorted(extra)}"]
+
+    def validate(self, changed_only: bool = False) -> None:
+        if self.parser is None:
+            raise NVLRCNotFound("NVLRC not found at default path.")
 
-    def validate(self) -> None:
         if not os.path.exists(self.scenes_dir):
             raise ScenesStructureError("Path of scenes dir does not exist.")
 
         if not os.path.isdir(self.scenes_dir):
             raise ScenesStructureError("Scenes path exists, but is not a directory.")
 
-        scene_ids = []
-
-        for root, _, files in os.walk(self.scenes_dir):
-            json_files = [f for f in files if f.endswith(".json")]
-            self.count = len(json_files)
-
-            if self.count == 0:
-                raise ScenesStructureError("Scenes directory is empty or has no .json files.")
-
-            for filename in json_files:
-                path = os.path.join(root, filename)
-                if not os.path.isfile(path):
-                    continue
-
-                try:
-                    scene_id = int(os.path.splitext(filename)[0])
-                    scene_ids.append(scene_id)
-                except ValueError:
-                    raise SceneFormatError(f"Scene file {filename} must be named as an integer (e.g., 1.json, 2.json, ...).")
-                try:
-                    with open(path, 'r') as f:
-                        content = f.read()
-                        if not self.is_valid_json(content):
-                            raise SceneFormatError(f"Invalid JSON in scene: {path}")
-                except SceneFormatError as e:
-                    raise SceneFormatError(f"Failed to read or parse {path}: {e}")
-
-        expected_ids = set(range(1, self.count + 1))
-        actual_ids = set(scene_ids)
-        if expected_ids != actual_ids:
-            missing = expected_ids - actual_ids
-            extra = actual_ids - expected_ids
-            raise SceneFormatError(f"Scene IDs mismatch. Missing: {sorted(missing)}; Unexpected: {sorted(extra)}")
-        print(f"🎉 All {self.count} scenes validated!")
+        stats = self.scan_scenes()
+        self.count = len(stats)
+
+        if self.count == 0:
+            raise ScenesStructureError("Scenes directory is empty or has no .json files.")
+
+        cache, changed = self.update_cache(stats)
+
+        # with --changed-only, unchanged scenes that already failed or reference files still count
+        report = sorted(stats)
+        if changed_only:
+            fresh = set(changed)
+            report = [path for path in report if path in fresh or cache[path]["errors"] or cache[path]["refs"]]
+        errors = self.report_errors(cache, report)
+        errors.extend(self.id_errors(stats))
+
+        if errors:
+            raise SceneFormatError(f"{len(errors)} problem(s) found:\n" + "\n".join(errors))
+        if changed_only:
+            print(f"🎉 {len(changed)} changed of {self.count} scenes validated!")
+        else:
+            print(f"🎉 All {self.count} scenes validated!")
 
     def preview(self, id: int):
         self.validate()
@@ -96,17 +152,53 @@ class TNFDevTools:
         getpass(prompt='')
         eng.exit()
     
-    def run(self, package: str = '', folder: str = '', from_id: int = 1):
+    def compile(self, out_name: str = ''):
+        self.validate()
+        from .src.packaging.bundle import NVLBundleBuilder
+        out_name = out_name or self.parser.get_scene_bundle()
+        count = NVLBundleBuilder(self.scenes_dir).build(out_name)
+        print(f"📦 Compiled {count} scenes into {out_name}")
+
+    def profile_scripts(self, limit: int = 20):
         self.validate()
+        import io
+        from rich.console import Console
         from .src.logic_engine import LogicEngine
+        from .src.capatibilities.audio import AudioManager, NullBackend
         eng = LogicEngine()
+        # headless: nothing is drawn or played, only the scripts run
+        eng.console = Console(file=io.StringIO())
+        eng.audio = AudioManager(eng.fs, NullBackend())
         eng.register_scenes()
-        if from_id != 1:
-            eng.custom_scene(from_id)
+        eng.scripts.profile = True
+        scripted = 0
+        for scene_id in eng.scenes.ids:
+            scene = eng.scenes.get(scene_id)
+            if "script" not in scene:
+                continue
+            scripted += 1
+            eng.load_scene(scene)
+            eng.apply_lua_logic()
+            eng.apply_lua_logic(lua_function_name="post_scene")
+        eng.prefetcher.shutdown()
+        eng.audio.close()
+        eng.saves.close()
+        print(eng.scripts.format_profile(limit))
+        aborted = sum(stats.aborted for stats in eng.scripts.stats.values())
+        print(f"⏱ profiled scripts of {scripted} scenes, {aborted} runs stopped by the budget")
+
+    def run(self, package: str = '', folder: str = '', from_id: int = 1):
+        from .src.logic_engine import LogicEngine
         if package != '':
-            pass
+            from .src.packaging.vfs import PackageFS
+            eng = LogicEngine(fs=PackageFS(package))
         else:
-            eng.run(register=False, load_save=False)
+            self.validate()
+            eng = LogicEngine()
+        eng.register_scenes()
+        if from_id != 1:
+            eng.custom_scene(from_id)
+        eng.run(register=False, load_save=False)
 
 
 
@@ -119,6 +211,17 @@ class CLITFN(TNFDevTools):
         play_parser.add_argument("--scene", required=True, help="ID of scene.")
 
         validate_parser = subparsers.add_parser("validate", help="Check folder scenes.")
+        validate_parser.add_argument(
+            "--changed-only", action="store_true", help="Only report scenes changed since the last validation."
+        )
+
+        compile_parser = subparsers.add_parser("compile", help="Pack scenes into a binary bundle.")
+        compile_parser.add_argument("--out", default="", help="Bundle path (default: scene-bundle from nvlrc).")
+
+        profile_parser = subparsers.add_parser(
+            "profile-scripts", help="Run every scene script headlessly and rank the slow ones."
+        )
+        profile_parser.add_argument("--top", type=int, default=20, help="How many scripts and functions to list.")
 
         run_parser = subparsers.add_parser("run", help="Run novell package or folder.")
         run_subparsers = run_parser.add_subparsers(dest="run_command", required=True)
@@ -137,16 +240,23 @@ class CLITFN(TNFDevTools):
         if self.args.command == "preview":
             self.preview(int(self.args.scene))
         elif self.args.command == "validate":
-            self.validate()
+            self.validate(self.args.changed_only)
+        elif self.args.command == "compile":
+            self.compile(self.args.out)
+        elif self.args.command == "profile-scripts":
+            self.profile_scripts(self.args.top)
         elif self.args.command == "run":
             if self.args.run_command == "package":
                 pkg_path = self.args.pkg_path
                 from_id  = self.args.from_id
-                pass
+                if from_id is not None:
+                    self.run(package=pkg_path, from_id=int(from_id))
+                else:
+                    self.run(package=pkg_path)
             elif self.args.run_command == "folder":
                 folder_path = self.args.folder_path
                 from_id = self.args.from_id
-                if from_id != None:
+                if from_id is not None:
                     self.run(from_id=int(from_id))
                 else:
                     self.run()
@@ -0,0 +1,66 @@
+import hashlib
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+THUMB_DIR = ".ide-thumbs"
+THUMB_SIZE = (300, 200)
+
+
+class ThumbnailCache:
+    # backgrounds are decoded and shrunk on worker threads; finished thumbnails wait in
+    # `results` for the UI thread to pick up, Tk objects are never touched from a worker
+    def __init__(self, cache_dir: str = THUMB_DIR, size: tuple = THUMB_SIZE, workers: int = 2) -> None:
+        self.cache_dir = cache_dir
+        self.size = size
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumbnail")
+        self.results: queue.Queue = queue.Queue()
+        self.digests: dict = {}
+        self.lock = threading.Lock()
+
+    def request(self, path: str) -> None:
+        self.pool.submit(self._work, path)
+
+    def digest(self, path: str) -> str:
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            digest = self.digests.get(key)
+        if digest is None:
+            sha = hashlib.sha1()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    sha.update(block)
+            digest = sha.hexdigest()
+            with self.lock:
+                self.digests[key] = digest
+        return digest
+
+    def thumbnail(self, path: str) -> Image.Image:
+        # keyed by content, so a copied or renamed background reuses its thumbnail
+        cached = os.path.join(self.cache_dir, f"{self.digest(path)}-{self.size[0]}x{self.size[1]}.png")
+        if os.path.exists(cached):
+            with Image.open(cached) as img:
+                img.load()
+                return img
+        with Image.open(path) as img:
+            # JPEGs are decoded straight at a reduced scale
+            img.draft("RGB", self.size)
+            img.thumbnail(self.size)
+            thumb = img.convert("RGBA") if img.mode not in ("RGB", "RGBA") else img.copy()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = f"{cached}.{threading.get_ident()}.tmp"
+        thumb.save(tmp, "PNG")
+        os.replace(tmp, cached)
+        return thumb
+
+    def _work(self, path: str) -> None:
+        try:
+            self.results.put((path, self.thumbnail(path), None))
+        except Exception as e:
+            self.results.put((path, None, e))
+
+    def shutdown(self) -> None:
+        self.pool.shutdown(wait=False, cancel_futures=True)